@@ -39,6 +39,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from shared.database.supabase_connection import (
     SupabaseManager, init_database, close_database, health_check as db_health_check
 )
+from shared.deadline import DeadlineMiddleware
+from shared.metrics import instrument_app
 
 # Configure logging
 logging.basicConfig(
@@ -82,6 +84,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Abandon requests once the gateway's deadline has passed
+app.add_middleware(DeadlineMiddleware)
+
+# Request and DB pool metrics at GET /metrics
+instrument_app(app, service="course-service")
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -469,14 +477,14 @@ async def track_progress(course_id: str, request: ProgressTrackRequest, db: Supa
 if __name__ == "__main__":
     # Get configuration from environment
     host = os.getenv("SERVICE_HOST", "0.0.0.0")
-    port = int(os.getenv("SERVICE_PORT", "8007"))
+    port = int(os.getenv("SERVICE_PORT", "8001"))
     
-    # Run the service
+    # Run the service (use scripts/launch.py for multi-worker production runs)
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=True,
+        reload=os.getenv("SERVICE_RELOAD", "false").lower() in ("1", "true", "yes"),
         log_level="info",
         access_log=True
     )
\ No newline at end of file
@@ -12,6 +12,11 @@ from pymongo import MongoClient
 from bson import ObjectId
 import motor.motor_asyncio
 from contextlib import asynccontextmanager
+import sys
+
+# Add the backend directory to the path for shared module imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from shared.metrics import instrument_app
 
 # Database connection
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
@@ -82,6 +87,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Request metrics at GET /metrics
+instrument_app(app, service="dsa-service")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,4 +1,3 @@
-import io
 import json
 import logging
 import os
@@ -7,8 +6,6 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, Dict, Optional
 
-import docx
-import PyPDF2
 from fastapi import FastAPI, File, Form, HTTPException, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -31,6 +28,13 @@ from shared.database.supabase_connection import (init_database,
                                                  save_user_projects,
                                                  save_user_skills,
                                                  update_user_profile)
+from shared.deadline import DeadlineMiddleware, time_left
+from shared.document_text import extract_text, shutdown_extraction_pool
+from shared.llm_slots import llm_slot
+from shared.metrics import instrument_app, track_llm_call
+from shared.prompt_compaction import compact_resume
+from shared.resume_prompts import PROFILE_SYSTEM_PROMPT, format_profile, profile_confidence, profile_prompt
+from shared.tracing import TracingMiddleware, span
 
 # Create a SupabaseManager instance
 supabase_manager = SupabaseManager()
@@ -50,12 +54,22 @@ async def lifespan(app: FastAPI):
     
     yield
     
+    shutdown_extraction_pool()
     await close_database()
     logger.info("🛑 Profile Service shutdown complete")
 
 # Create FastAPI app with lifespan
 app = FastAPI(title="Profile Service - Supabase Edition", lifespan=lifespan)
 
+# Abandon requests once the gateway's deadline has passed
+app.add_middleware(DeadlineMiddleware)
+
+# Request, DB pool and LLM metrics at GET /metrics
+instrument_app(app, service="profile-service")
+
+# Join the gateway's trace and record a span per extraction stage
+app.add_middleware(TracingMiddleware, service="profile-service")
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -68,130 +82,40 @@ app.add_middleware(
 # AI Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+# Upper bound for one LLM call; requests with a deadline get whatever is left of it instead
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
 # Initialize Groq client
 groq_client = None
 if GROQ_API_KEY:
     try:
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_API_KEY)
+        from groq import AsyncGroq
+        groq_client = AsyncGroq(api_key=GROQ_API_KEY)
         logger.info("✅ Groq client initialized successfully")
     except ImportError:
         logger.warning("⚠️ Groq library not installed")
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting PDF text: {e}")
-        return ""
-
-def extract_text_from_docx(file_content: bytes) -> str:
-    """Extract text from DOCX file"""
-    try:
-        doc = docx.Document(io.BytesIO(file_content))
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting DOCX text: {e}")
-        return ""
-
 async def extract_profile_with_groq(resume_text: str) -> dict:
     """Extract profile data using Groq AI"""
     if not groq_client:
         raise Exception("Groq client not available")
     
     try:
-        prompt = f"""
-        Extract structured profile information from this resume text. Be precise and only extract information that is clearly present.
-        
-        Resume Text:
-        {resume_text}
-        
-        Please provide a JSON response with the following structure:
-        {{
-            "personal_info": {{
-                "name": "Full name (only if clearly stated)",
-                "email": "Email address (only if found)",
-                "phone": "Phone number (only if found)",
-                "location": "Location/Address (only if found)",
-                "linkedin": "LinkedIn URL (only if found)",
-                "github": "GitHub URL (only if found)",
-                "portfolio": "Portfolio URL (only if found)"
-            }},
-            "professional_summary": "Professional summary or objective (only if present)",
-            "skills": [
-                {{
-                    "name": "Skill name",
-                    "level": "Beginner|Intermediate|Advanced|Expert",
-                    "category": "Technical|Soft|Language|Framework|Tool"
-                }}
-            ],
-            "experience": [
-                {{
-                    "company": "Company name",
-                    "position": "Job title",
-                    "location": "Work location",
-                    "startDate": "Start date (YYYY-MM format if possible)",
-                    "endDate": "End date (YYYY-MM format if possible)",
-                    "current": false,
-                    "description": "Job description and achievements",
-                    "technologies": ["List of technologies used"]
-                }}
-            ],
-            "education": [
-                {{
-                    "institution": "University/School name",
-                    "degree": "Degree name",
-                    "field": "Field of study",
-                    "startYear": "Start year",
-                    "endYear": "End year",
-                    "grade": "GPA or grade if mentioned",
-                    "description": "Additional details"
-                }}
-            ],
-            "projects": [
-                {{
-                    "title": "Project name",
-                    "description": "Project description",
-                    "technologies": ["Technologies used"],
-                    "startDate": "Start date if available",
-                    "endDate": "End date if available",
-                    "githubUrl": "GitHub URL if found",
-                    "liveUrl": "Live demo URL if found",
-                    "highlights": ["Key achievements or features"]
-                }}
-            ],
-            "certifications": [
-                {{
-                    "name": "Certification name",
-                    "issuer": "Issuing organization",
-                    "issueDate": "Issue date",
-                    "expiryDate": "Expiry date if applicable",
-                    "credentialId": "Credential ID if available",
-                    "credentialUrl": "Credential URL if available"
-                }}
-            ]
-        }}
-        
-        Only return valid JSON, no additional text. If information is not found, use empty strings or empty arrays.
-        """
-        
-        response = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an expert at extracting structured data from resumes. Always return valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            model="llama-3.1-70b-versatile",
-            temperature=0.1,
-            max_tokens=3000
-        )
+        prompt = profile_prompt(compact_resume(resume_text, "profile"))
+        
+        async with llm_slot(LLM_TIMEOUT):
+            with span("llm.groq", {"model": "llama-3.1-70b-versatile"}), track_llm_call("groq", "llama-3.1-70b-versatile") as call:
+                response = await groq_client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": PROFILE_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    model="llama-3.1-70b-versatile",
+                    temperature=0.1,
+                    max_tokens=3000,
+                    timeout=time_left(LLM_TIMEOUT)
+                )
+                call.set_usage(response.usage)
         
         extracted_data = json.loads(response.choices[0].message.content.strip())
         return extracted_data
@@ -218,23 +142,21 @@ async def extract_profile_data(
         
         try:
             # Upload file to Supabase storage
-            storage_result = supabase_manager.supabase.storage.from_('resume-files').upload(
-                storage_filename,
-                file_content,
-                file_options={"content-type": resume.content_type}
-            )
+            with span("storage.upload", {"bytes": len(file_content)}):
+                storage_result = supabase_manager.supabase.storage.from_('resume-files').upload(
+                    storage_filename,
+                    file_content,
+                    file_options={"content-type": resume.content_type}
+                )
             logger.info(f"📁 File uploaded to storage: {storage_filename}")
         except Exception as storage_error:
             logger.warning(f"⚠️ Storage upload failed: {storage_error}")
             # Continue with extraction even if storage fails
         
         # Extract text based on file type
-        if resume.content_type == "application/pdf":
-            resume_text = extract_text_from_pdf(file_content)
-        elif resume.content_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
-            resume_text = extract_text_from_docx(file_content)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+        with span("extract_text", {"content_type": resume.content_type, "bytes": len(file_content)}) as extract_span:
+            resume_text = await extract_text(file_content, resume.content_type)
+            extract_span.set_attribute("chars", len(resume_text))
         
         if not resume_text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from resume. Please check file format.")
@@ -253,7 +175,8 @@ async def extract_profile_data(
                 "extraction_status": "processing"
             }
             
-            supabase_manager.supabase.table('user_resumes').insert(resume_record).execute()
+            with span("db.insert", {"table": "user_resumes"}):
+                supabase_manager.supabase.table('user_resumes').insert(resume_record).execute()
             logger.info("💾 Resume metadata saved to database")
         except Exception as db_error:
             logger.warning(f"⚠️ Failed to save resume metadata: {db_error}")
@@ -266,44 +189,8 @@ async def extract_profile_data(
         extracted_data = await extract_profile_with_groq(resume_text)
         
         # Transform extracted data to match frontend format
-        formatted_data = {
-            "personalInfo": {
-                "fullName": extracted_data.get("personal_info", {}).get("name", ""),
-                "email": extracted_data.get("personal_info", {}).get("email", ""),
-                "phone": extracted_data.get("personal_info", {}).get("phone", ""),
-                "location": extracted_data.get("personal_info", {}).get("location", ""),
-                "linkedin": extracted_data.get("personal_info", {}).get("linkedin", ""),
-                "github": extracted_data.get("personal_info", {}).get("github", ""),
-                "portfolio": extracted_data.get("personal_info", {}).get("portfolio", ""),
-            },
-            "education": extracted_data.get("education", []),
-            "experience": extracted_data.get("experience", []),
-            "projects": extracted_data.get("projects", []),
-            "skills": extracted_data.get("skills", []),
-            "certifications": extracted_data.get("certifications", []),
-            "summary": extracted_data.get("professional_summary", "")
-        }
-        
-        # Calculate confidence score
-        confidence_score = 0.0
-        total_fields = 0
-        filled_fields = 0
-        
-        # Check personal info completeness
-        personal_info = formatted_data["personalInfo"]
-        for field in ["fullName", "email", "phone", "location"]:
-            total_fields += 1
-            if personal_info.get(field) and personal_info.get(field).strip():
-                filled_fields += 1
-        
-        # Check other sections
-        sections = ["skills", "experience", "education", "projects", "certifications"]
-        for section in sections:
-            total_fields += 1
-            if formatted_data.get(section) and len(formatted_data.get(section, [])) > 0:
-                filled_fields += 1
-        
-        confidence_score = (filled_fields / total_fields) * 100 if total_fields > 0 else 0
+        formatted_data = format_profile(extracted_data)
+        confidence_score = profile_confidence(formatted_data)
         
         # Store extraction result
         try:
@@ -315,7 +202,8 @@ async def extract_profile_data(
                 "extraction_type": "groq_ai"
             }
             
-            supabase_manager.supabase.table('resume_extractions').insert(extraction_record).execute()
+            with span("db.insert", {"table": "resume_extractions"}):
+                supabase_manager.supabase.table('resume_extractions').insert(extraction_record).execute()
             logger.info("💾 Extraction result saved to database")
         except Exception as db_error:
             logger.warning(f"⚠️ Failed to save extraction result: {db_error}")
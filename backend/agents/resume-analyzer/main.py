@@ -1,19 +1,38 @@
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+import asyncio
 import os
-from typing import Optional
-import PyPDF2
-import docx
-import io
+import socket
+import uuid
+from typing import Optional, Tuple
 import json
 from datetime import datetime
 import logging
 import sys
-sys.path.append('/app/shared')
-from database.supabase_connection import (
-    init_database, close_database, save_resume_analysis, 
+
+# Add the backend directory to the path for shared module imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from shared.database.supabase_connection import (
+    init_database, close_database, save_resume_analysis, save_resume_extraction,
+    create_analysis_job, update_analysis_job, get_analysis_job,
+    fail_interrupted_analysis_jobs, heartbeat_analysis_jobs,
+    get_cached_analysis, save_cached_analysis, purge_expired_analysis_cache,
     health_check as db_health_check
 )
+from shared.analysis_cache import AnalysisCacheStore, analysis_cache_key, create_analysis_cache
+from shared.document_text import extract_text, shutdown_extraction_pool
+from shared.jobs import TERMINAL_STATES, JobQueue, JobStore
+from shared.llm_router import LLMRouter
+from shared.llm_slots import llm_slot
+from shared.resume_prompts import (
+    ANALYSIS_SYSTEM_PROMPT, COMBINED_SYSTEM_PROMPT, PROFILE_SYSTEM_PROMPT,
+    analysis_prompt, combined_prompt, format_profile, profile_confidence, profile_prompt
+)
+from shared.deadline import DeadlineMiddleware, check_deadline, time_left, with_deadline
+from shared.metrics import instrument_app, track_llm_call
+from shared.prompt_compaction import compact_resume, compact_whitespace
+from shared.tracing import TracingMiddleware, span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,6 +40,15 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Resume Analyzer Service - Supabase Edition")
 
+# Abandon requests once the gateway's deadline has passed
+app.add_middleware(DeadlineMiddleware)
+
+# Request, DB pool and LLM metrics at GET /metrics
+instrument_app(app, service="resume-analyzer")
+
+# Join the gateway's trace and record a span per analysis stage
+app.add_middleware(TracingMiddleware, service="resume-analyzer")
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -34,14 +62,17 @@ app.add_middleware(
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 
+# Upper bound for one LLM call; requests with a deadline get whatever is left of it instead
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
 # Initialize AI clients
 groq_client = None
 gemini_model = None
 
 if GROQ_API_KEY:
     try:
-        from groq import Groq
-        groq_client = Groq(api_key=GROQ_API_KEY)
+        from groq import AsyncGroq
+        groq_client = AsyncGroq(api_key=GROQ_API_KEY)
         logger.info("✅ Groq client initialized successfully")
     except ImportError:
         logger.warning("⚠️ Groq library not installed, falling back to Gemini")
@@ -55,96 +86,139 @@ if GEMINI_API_KEY:
     except ImportError:
         logger.warning("⚠️ Gemini library not installed")
 
+# Picks and hedges between Groq and Gemini from their recent latency and errors
+llm_router = LLMRouter()
+
+# Background analysis jobs
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "4"))
+ANALYSIS_JOB_MAX_PENDING = int(os.getenv("ANALYSIS_JOB_MAX_PENDING", "100"))
+# Jobs are owned by the process running them, which renews their heartbeat; only jobs
+# whose heartbeat is older than ANALYSIS_JOB_STALE_AFTER are failed as interrupted
+ANALYSIS_JOB_HEARTBEAT_INTERVAL = float(os.getenv("ANALYSIS_JOB_HEARTBEAT_INTERVAL", "15"))
+ANALYSIS_JOB_STALE_AFTER = float(os.getenv("ANALYSIS_JOB_STALE_AFTER", "60"))
+JOB_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+JOB_EVENTS_KEEPALIVE = 15
+
+SUPPORTED_CONTENT_TYPES = [
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+]
+
+class SupabaseJobStore(JobStore):
+    """Mirror analysis jobs to the resume_analysis_jobs table"""
+
+    async def create(self, job: dict):
+        await create_analysis_job(job, JOB_OWNER)
+
+    async def update(self, job: dict):
+        await update_analysis_job(job)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await get_analysis_job(job_id)
+
+class SupabaseAnalysisStore(AnalysisCacheStore):
+    """Keep cached analyses in the resume_analysis_cache table"""
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await get_cached_analysis(key)
+
+    async def set(self, key: str, value: dict, ttl: float):
+        await save_cached_analysis(key, value, ttl)
+
+# Bump whenever the analysis prompts or output format change, to retire cached analyses
+ANALYSIS_PROMPT_VERSION = "2"
+
+analysis_cache = create_analysis_cache(SupabaseAnalysisStore())
+
+async def run_analysis_job(payload: dict) -> dict:
+    return await run_resume_analysis(**payload)
+
+analysis_jobs = JobQueue(
+    "resume-analysis",
+    run_analysis_job,
+    workers=ANALYSIS_JOB_WORKERS,
+    max_pending=ANALYSIS_JOB_MAX_PENDING,
+    store=SupabaseJobStore(),
+)
+
+async def maintain_analysis_jobs():
+    """Keep this process's jobs alive and fail those of processes that have stopped"""
+    while True:
+        try:
+            await heartbeat_analysis_jobs(JOB_OWNER)
+            await fail_interrupted_analysis_jobs(ANALYSIS_JOB_STALE_AFTER)
+        except Exception as e:
+            logger.warning(f"⚠️ Analysis job maintenance failed: {e}")
+        await asyncio.sleep(ANALYSIS_JOB_HEARTBEAT_INTERVAL)
+
+job_maintenance_task: Optional[asyncio.Task] = None
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database connection on startup"""
+    """Initialize database connection and job workers on startup"""
     try:
         await init_database()
         logger.info("🚀 Resume Analyzer Service started successfully")
     except Exception as e:
         logger.error(f"❌ Failed to initialize database: {e}")
         raise e
+    
+    if analysis_cache and isinstance(analysis_cache.store, SupabaseAnalysisStore):
+        try:
+            await purge_expired_analysis_cache()
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to purge expired cached analyses: {e}")
+    await analysis_jobs.start()
+    global job_maintenance_task
+    job_maintenance_task = asyncio.create_task(maintain_analysis_jobs())
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database connection on shutdown"""
+    """Stop job workers and close database connection on shutdown"""
+    if job_maintenance_task:
+        job_maintenance_task.cancel()
+    await analysis_jobs.stop()
+    shutdown_extraction_pool()
     await close_database()
     logger.info("🛑 Resume Analyzer Service shutdown complete")
 
-def extract_text_from_pdf(file_content: bytes) -> str:
-    """Extract text from PDF file"""
-    try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting PDF text: {e}")
-        return ""
+async def complete_json_with_groq(system_prompt: str, prompt: str, max_tokens: int) -> dict:
+    """Run one Groq chat completion and parse its JSON answer"""
+    if not groq_client:
+        raise Exception("Groq client not available")
+    
+    async with llm_slot(LLM_TIMEOUT):
+        with span("llm.groq", {"model": "llama-3.1-70b-versatile"}), track_llm_call("groq", "llama-3.1-70b-versatile") as call:
+            response = await groq_client.chat.completions.create(
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                model="llama-3.1-70b-versatile",
+                temperature=0.1,
+                max_tokens=max_tokens,
+                timeout=time_left(LLM_TIMEOUT)
+            )
+            call.set_usage(response.usage)
+    
+    return json.loads(response.choices[0].message.content.strip())
 
-def extract_text_from_docx(file_content: bytes) -> str:
-    """Extract text from DOCX file"""
-    try:
-        doc = docx.Document(io.BytesIO(file_content))
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        return text
-    except Exception as e:
-        logger.error(f"Error extracting DOCX text: {e}")
-        return ""
+async def complete_json_with_gemini(prompt: str) -> dict:
+    """Run one Gemini generation and parse its JSON answer"""
+    if not gemini_model:
+        raise Exception("Gemini model not available")
+    
+    async with llm_slot(LLM_TIMEOUT):
+        with span("llm.gemini", {"model": "gemini-pro"}), track_llm_call("gemini", "gemini-pro") as call:
+            response = await with_deadline(gemini_model.generate_content_async(prompt), LLM_TIMEOUT)
+            call.set_gemini_usage(getattr(response, "usage_metadata", None))
+    return json.loads(response.text.strip())
 
 async def analyze_with_groq(resume_text: str, job_role: str, job_description: str = "") -> dict:
     """Analyze resume using Groq AI"""
-    if not groq_client:
-        raise Exception("Groq client not available")
-    
     try:
-        prompt = f"""
-        Analyze this resume for the job role: {job_role}
-        
-        Job Description: {job_description}
-        
-        Resume Content:
-        {resume_text}
-        
-        Provide a comprehensive analysis in JSON format:
-        {{
-            "overall_score": "Score out of 100",
-            "job_match_score": "How well resume matches the job role (0-100)",
-            "ats_score": "ATS compatibility score (0-100)",
-            "strengths": ["List of resume strengths relevant to the job"],
-            "weaknesses": ["Areas that need improvement"],
-            "skill_gaps": ["Missing skills for the job role"],
-            "recommendations": ["Specific recommendations to improve the resume"],
-            "keywords_found": ["Important keywords found in resume"],
-            "missing_keywords": ["Important keywords missing from resume"],
-            "sections_analysis": {{
-                "summary": "Analysis of professional summary",
-                "experience": "Analysis of work experience",
-                "skills": "Analysis of skills section",
-                "education": "Analysis of education",
-                "overall_structure": "Analysis of resume structure and formatting"
-            }},
-            "improvement_priority": ["Top 3 areas to focus on for improvement"],
-            "role_specific_advice": ["Advice specific to the {job_role} role"]
-        }}
-        
-        Only return valid JSON, no additional text.
-        """
-        
-        response = groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an expert resume analyzer. Always respond with valid JSON only."},
-                {"role": "user", "content": prompt}
-            ],
-            model="llama-3.1-70b-versatile",
-            temperature=0.1,
-            max_tokens=2000
-        )
-        
-        analysis = json.loads(response.choices[0].message.content.strip())
+        analysis = await complete_json_with_groq(ANALYSIS_SYSTEM_PROMPT, analysis_prompt(resume_text, job_role, job_description), 2000)
         analysis["ai_provider"] = "groq"
         return analysis
         
@@ -154,45 +228,8 @@ async def analyze_with_groq(resume_text: str, job_role: str, job_description: st
 
 async def analyze_with_gemini(resume_text: str, job_role: str, job_description: str = "") -> dict:
     """Analyze resume using Gemini AI (fallback)"""
-    if not gemini_model:
-        raise Exception("Gemini model not available")
-    
     try:
-        prompt = f"""
-        Analyze this resume for the job role: {job_role}
-        
-        Job Description: {job_description}
-        
-        Resume Content:
-        {resume_text}
-        
-        Provide a comprehensive analysis in JSON format:
-        {{
-            "overall_score": "Score out of 100",
-            "job_match_score": "How well resume matches the job role (0-100)",
-            "ats_score": "ATS compatibility score (0-100)",
-            "strengths": ["List of resume strengths relevant to the job"],
-            "weaknesses": ["Areas that need improvement"],
-            "skill_gaps": ["Missing skills for the job role"],
-            "recommendations": ["Specific recommendations to improve the resume"],
-            "keywords_found": ["Important keywords found in resume"],
-            "missing_keywords": ["Important keywords missing from resume"],
-            "sections_analysis": {{
-                "summary": "Analysis of professional summary",
-                "experience": "Analysis of work experience",
-                "skills": "Analysis of skills section",
-                "education": "Analysis of education",
-                "overall_structure": "Analysis of resume structure and formatting"
-            }},
-            "improvement_priority": ["Top 3 areas to focus on for improvement"],
-            "role_specific_advice": ["Advice specific to the {job_role} role"]
-        }}
-        
-        Only return valid JSON, no additional text.
-        """
-        
-        response = gemini_model.generate_content(prompt)
-        analysis = json.loads(response.text.strip())
+        analysis = await complete_json_with_gemini(analysis_prompt(resume_text, job_role, job_description))
         analysis["ai_provider"] = "gemini"
         return analysis
         
@@ -200,6 +237,182 @@ async def analyze_with_gemini(resume_text: str, job_role: str, job_description:
         logger.error(f"Gemini analysis failed: {e}")
         raise e
 
+def provider_calls(system_prompt: str, prompt: str, max_tokens: int) -> dict:
+    """Router calls sending one prompt to every configured provider"""
+    calls = {}
+    if groq_client:
+        calls["groq"] = lambda: complete_json_with_groq(system_prompt, prompt, max_tokens)
+    if gemini_model:
+        calls["gemini"] = lambda: complete_json_with_gemini(prompt)
+    return calls
+
+async def extract_resume_text(file_content: bytes, content_type: str) -> str:
+    """Extract the resume text, rejecting files with no readable text"""
+    with span("extract_text", {"content_type": content_type, "bytes": len(file_content)}) as extract_span:
+        resume_text = await extract_text(file_content, content_type)
+        extract_span.set_attribute("chars", len(resume_text))
+    
+    if not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Could not extract text from resume. Please check file format.")
+    
+    logger.info(f"📄 Extracted {len(resume_text)} characters from resume")
+    return resume_text
+
+def fallback_analysis() -> dict:
+    """Canned analysis returned when every AI provider failed"""
+    return {
+        "overall_score": 50,
+        "job_match_score": 50,
+        "ats_score": 50,
+        "strengths": ["Resume uploaded successfully"],
+        "weaknesses": ["AI analysis temporarily unavailable"],
+        "skill_gaps": ["Unable to analyze at this time"],
+        "recommendations": ["Please try again later"],
+        "keywords_found": [],
+        "missing_keywords": [],
+        "sections_analysis": {
+            "summary": "Analysis unavailable",
+            "experience": "Analysis unavailable",
+            "skills": "Analysis unavailable",
+            "education": "Analysis unavailable",
+            "overall_structure": "Analysis unavailable"
+        },
+        "improvement_priority": ["Try uploading again"],
+        "role_specific_advice": ["AI service temporarily unavailable"],
+        "ai_provider": "fallback"
+    }
+
+async def analyze_resume_text(resume_text: str, job_role: str, job_description: str = "") -> dict:
+    """Analyze resume text with the fastest healthy provider, hedging with the other"""
+    resume_text = compact_resume(resume_text, "analysis")
+    job_description = compact_whitespace(job_description)
+    # Race the providers: the backup starts when the best one is slow or fails
+    calls = {}
+    if groq_client:
+        calls["groq"] = lambda: analyze_with_groq(resume_text, job_role, job_description)
+    if gemini_model:
+        calls["gemini"] = lambda: analyze_with_gemini(resume_text, job_role, job_description)
+    try:
+        logger.info(f"🧠 Analyzing with AI providers: {', '.join(llm_router.rank(list(calls)))}")
+        provider, analysis = await llm_router.run(calls)
+        logger.info(f"✅ Analysis answered by {provider}")
+        return analysis
+    except Exception as e:
+        logger.error(f"❌ All AI providers failed: {e}")
+        check_deadline()
+        return fallback_analysis()
+
+async def extract_profile(resume_text: str) -> Optional[dict]:
+    """Extract the structured profile from resume text; None when every provider failed"""
+    try:
+        prompt = profile_prompt(compact_resume(resume_text, "profile"))
+        provider, extracted_data = await llm_router.run(provider_calls(PROFILE_SYSTEM_PROMPT, prompt, 3000))
+        logger.info(f"✅ Profile extracted by {provider}")
+        return format_profile(extracted_data)
+    except Exception as e:
+        logger.error(f"❌ Profile extraction failed: {e}")
+        check_deadline()
+        return None
+
+async def analyze_and_extract_in_one_call(resume_text: str, job_role: str, job_description: str = "") -> Tuple[dict, dict]:
+    """Get the analysis and the profile from a single LLM call"""
+    prompt = combined_prompt(compact_resume(resume_text, "combined"), job_role, compact_whitespace(job_description))
+    provider, combined = await llm_router.run(provider_calls(COMBINED_SYSTEM_PROMPT, prompt, 5000))
+    if not isinstance(combined.get("analysis"), dict) or not isinstance(combined.get("profile"), dict):
+        raise ValueError("Combined answer is missing the analysis or the profile")
+    analysis = combined["analysis"]
+    analysis["ai_provider"] = provider
+    logger.info(f"✅ Analysis and profile answered by {provider} in one call")
+    return analysis, format_profile(combined["profile"])
+
+async def cached_analysis(file_content: bytes, job_role: str, job_description: str) -> Tuple[str, Optional[dict]]:
+    """Cache key for this upload and the analysis cached under it, if any"""
+    # The same file analyzed for the same role and JD gets the same answer
+    cache_key = analysis_cache_key(file_content, job_role, job_description, ANALYSIS_PROMPT_VERSION)
+    cached = await analysis_cache.get(cache_key) if analysis_cache else None
+    if cached:
+        logger.info(f"⚡ Analysis cache hit for job role: {job_role}")
+    return cache_key, cached
+
+async def remember_analysis(cache_key: str, resume_text: str, analysis: dict):
+    # Canned fallback answers are not worth keeping
+    if analysis_cache and analysis.get("ai_provider") != "fallback":
+        await analysis_cache.set(cache_key, {"resume_text": resume_text, "analysis": analysis})
+
+async def save_analysis_result(
+    file_content: bytes,
+    filename: str,
+    job_role: str,
+    job_description: str,
+    user_id: Optional[str],
+    resume_text: str,
+    analysis: dict,
+    cache_hit: bool
+) -> dict:
+    """Build the analysis response and save the analysis for the user"""
+    result = {
+        "success": True,
+        "filename": filename,
+        "file_size": len(file_content),
+        "upload_date": datetime.now().isoformat(),
+        "job_role": job_role,
+        "job_description": job_description,
+        "extracted_text": resume_text[:1000],  # First 1000 chars for preview
+        "analysis": analysis,
+        "cache_hit": cache_hit,
+        "processing_status": "completed"
+    }
+    
+    # Save to Supabase if user_id provided
+    if user_id:
+        try:
+            logger.info(f"💾 Saving analysis to Supabase for user: {user_id}")
+            resume_data = {
+                "filename": filename,
+                "file_size": len(file_content),
+                "extracted_text": resume_text,
+                "ai_analysis": analysis,
+                "skill_gaps": analysis.get("skill_gaps", []),
+                "recommendations": analysis.get("recommendations", [])
+            }
+            
+            with span("db.save_resume_analysis"):
+                resume_id = await save_resume_analysis(user_id, resume_data)
+            result["resume_id"] = resume_id
+            logger.info(f"✅ Analysis saved with ID: {resume_id}")
+            
+        except Exception as db_error:
+            logger.error(f"💥 Database save failed: {db_error}")
+            # Don't fail the request if DB save fails
+            result["db_warning"] = "Analysis completed but failed to save to database"
+    
+    return result
+
+async def run_resume_analysis(
+    file_content: bytes,
+    filename: str,
+    content_type: str,
+    job_role: str,
+    job_description: str = "",
+    user_id: Optional[str] = None
+) -> dict:
+    """Extract text, analyze it with Groq/Gemini AI and save the result"""
+    logger.info(f"🔍 Starting resume analysis for job role: {job_role}")
+    
+    cache_key, cached = await cached_analysis(file_content, job_role, job_description)
+    if cached:
+        resume_text, analysis = cached["resume_text"], cached["analysis"]
+    else:
+        resume_text = await extract_resume_text(file_content, content_type)
+        analysis = await analyze_resume_text(resume_text, job_role, job_description)
+        await remember_analysis(cache_key, resume_text, analysis)
+    
+    result = await save_analysis_result(
+        file_content, filename, job_role, job_description, user_id, resume_text, analysis, cached is not None
+    )
+    logger.info(f"✅ Resume analysis completed successfully for {job_role}")
+    return result
+
 @app.post("/analyze-resume")
 async def analyze_resume(
     resume: UploadFile = File(...),
@@ -209,109 +422,162 @@ async def analyze_resume(
 ):
     """Analyze uploaded resume for specific job role using Groq/Gemini AI"""
     try:
-        logger.info(f"🔍 Starting resume analysis for job role: {job_role}")
-        
         # Read file content
         file_content = await resume.read()
         
-        # Extract text based on file type
-        if resume.content_type == "application/pdf":
-            resume_text = extract_text_from_pdf(file_content)
-        elif resume.content_type in ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"]:
-            resume_text = extract_text_from_docx(file_content)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+        return await run_resume_analysis(
+            file_content,
+            resume.filename,
+            resume.content_type,
+            job_role,
+            job_description,
+            user_id
+        )
         
-        if not resume_text.strip():
-            raise HTTPException(status_code=400, detail="Could not extract text from resume. Please check file format.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"💥 Critical error in analyze_resume: {e}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/analyze-and-extract")
+async def analyze_and_extract(
+    resume: UploadFile = File(...),
+    job_role: str = Form(...),
+    job_description: str = Form(""),
+    user_id: Optional[str] = Form(None),
+    single_call: bool = Form(False)
+):
+    """Analyze a resume and extract the profile from it with one upload and one parse"""
+    try:
+        file_content = await resume.read()
+        logger.info(f"🔍 Starting fused analysis and profile extraction for job role: {job_role}")
         
-        logger.info(f"📄 Extracted {len(resume_text)} characters from resume")
+        cache_key, cached = await cached_analysis(file_content, job_role, job_description)
+        resume_text = cached["resume_text"] if cached else await extract_resume_text(file_content, resume.content_type)
+        analysis = cached["analysis"] if cached else None
+        profile = None
+        mode = "cached" if cached else "parallel"
         
-        # Try Groq first, fallback to Gemini
-        analysis = None
-        try:
-            if groq_client:
-                logger.info("🧠 Analyzing with Groq AI...")
-                analysis = await analyze_with_groq(resume_text, job_role, job_description)
-            else:
-                raise Exception("Groq client not available")
-        except Exception as groq_error:
-            logger.warning(f"⚠️ Groq analysis failed: {groq_error}")
+        if analysis is None and single_call:
             try:
-                if gemini_model:
-                    logger.info("🔄 Falling back to Gemini AI...")
-                    analysis = await analyze_with_gemini(resume_text, job_role, job_description)
-                else:
-                    raise Exception("Gemini model not available")
-            except Exception as gemini_error:
-                logger.error(f"❌ Both AI providers failed. Groq: {groq_error}, Gemini: {gemini_error}")
-                # Return basic fallback analysis
-                analysis = {
-                    "overall_score": 50,
-                    "job_match_score": 50,
-                    "ats_score": 50,
-                    "strengths": ["Resume uploaded successfully"],
-                    "weaknesses": ["AI analysis temporarily unavailable"],
-                    "skill_gaps": ["Unable to analyze at this time"],
-                    "recommendations": ["Please try again later"],
-                    "keywords_found": [],
-                    "missing_keywords": [],
-                    "sections_analysis": {
-                        "summary": "Analysis unavailable",
-                        "experience": "Analysis unavailable",
-                        "skills": "Analysis unavailable",
-                        "education": "Analysis unavailable",
-                        "overall_structure": "Analysis unavailable"
-                    },
-                    "improvement_priority": ["Try uploading again"],
-                    "role_specific_advice": ["AI service temporarily unavailable"],
-                    "ai_provider": "fallback"
-                }
+                analysis, profile = await analyze_and_extract_in_one_call(resume_text, job_role, job_description)
+                mode = "single_call"
+            except Exception as e:
+                logger.warning(f"⚠️ Single-call analysis failed, falling back to parallel calls: {e}")
+                check_deadline()
         
-        # Prepare response
-        result = {
-            "success": True,
-            "filename": resume.filename,
-            "file_size": len(file_content),
-            "upload_date": datetime.now().isoformat(),
-            "job_role": job_role,
-            "job_description": job_description,
-            "extracted_text": resume_text[:1000],  # First 1000 chars for preview
-            "analysis": analysis,
-            "processing_status": "completed"
-        }
+        if analysis is None:
+            # Both LLM calls only need the text, so they run side by side
+            analysis, profile = await asyncio.gather(
+                analyze_resume_text(resume_text, job_role, job_description),
+                extract_profile(resume_text)
+            )
+        elif profile is None:
+            profile = await extract_profile(resume_text)
         
-        # Save to Supabase if user_id provided
-        if user_id:
-            try:
-                logger.info(f"💾 Saving analysis to Supabase for user: {user_id}")
-                resume_data = {
-                    "filename": resume.filename,
-                    "file_size": len(file_content),
-                    "extracted_text": resume_text,
-                    "ai_analysis": analysis,
-                    "skill_gaps": analysis.get("skill_gaps", []),
-                    "recommendations": analysis.get("recommendations", [])
-                }
-                
-                resume_id = await save_resume_analysis(user_id, resume_data)
-                result["resume_id"] = resume_id
-                logger.info(f"✅ Analysis saved with ID: {resume_id}")
-                
-            except Exception as db_error:
-                logger.error(f"💥 Database save failed: {db_error}")
-                # Don't fail the request if DB save fails
-                result["db_warning"] = "Analysis completed but failed to save to database"
+        if not cached:
+            await remember_analysis(cache_key, resume_text, analysis)
+        
+        result = await save_analysis_result(
+            file_content, resume.filename, job_role, job_description, user_id, resume_text, analysis, cached is not None
+        )
+        result["mode"] = mode
+        
+        if profile is None:
+            result["profile"] = None
+            result["profile_error"] = "Profile extraction temporarily unavailable"
+        else:
+            confidence_score = profile_confidence(profile)
+            result["profile"] = {"extracted_data": profile, "confidence_score": round(confidence_score, 2)}
+            if user_id:
+                try:
+                    with span("db.save_resume_extraction"):
+                        extraction_id = await save_resume_extraction(
+                            user_id, profile, confidence_score / 100, result.get("resume_id")
+                        )
+                    result["profile"]["extraction_id"] = extraction_id
+                    logger.info(f"💾 Extraction saved with ID: {extraction_id}")
+                except Exception as db_error:
+                    logger.error(f"💥 Extraction save failed: {db_error}")
+                    result["profile"]["db_warning"] = "Profile extracted but failed to save to database"
         
-        logger.info(f"✅ Resume analysis completed successfully for {job_role}")
+        logger.info(f"✅ Fused analysis completed for {job_role} ({mode})")
         return result
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"💥 Critical error in analyze_resume: {e}")
+        logger.error(f"💥 Critical error in analyze_and_extract: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.post("/jobs/analyze-resume", status_code=202)
+async def submit_analysis_job(
+    resume: UploadFile = File(...),
+    job_role: str = Form(...),
+    job_description: str = Form(""),
+    user_id: Optional[str] = Form(None)
+):
+    """Queue a resume analysis and return a job id immediately"""
+    if resume.content_type not in SUPPORTED_CONTENT_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+    
+    file_content = await resume.read()
+    job = await analysis_jobs.submit(
+        {
+            "file_content": file_content,
+            "filename": resume.filename,
+            "content_type": resume.content_type,
+            "job_role": job_role,
+            "job_description": job_description,
+            "user_id": user_id
+        },
+        {"user_id": user_id, "filename": resume.filename, "job_role": job_role}
+    )
+    logger.info(f"📥 Queued resume analysis job {job.id} for job role: {job_role}")
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events"
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_analysis_job_status(job_id: str):
+    """Get the status and, once finished, the result of an analysis job"""
+    job = await analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_analysis_job_events(job_id: str):
+    """Server-sent events with the job state on every change until it finishes"""
+    if not await analysis_jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_status = None
+        while True:
+            job = await analysis_jobs.get(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"event: {job['status']}\ndata: {json.dumps(job)}\n\n"
+            if job["status"] in TERMINAL_STATES:
+                return
+            if not await analysis_jobs.wait_for_change(job_id, JOB_EVENTS_KEEPALIVE):
+                # Comment line keeps proxies from timing out idle connections
+                yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint with database status"""
@@ -320,7 +586,8 @@ async def health_check():
         
         ai_status = {
             "groq_available": groq_client is not None,
-            "gemini_available": gemini_model is not None
+            "gemini_available": gemini_model is not None,
+            "routing": llm_router.snapshot()
         }
         
         return {
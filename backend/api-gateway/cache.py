@@ -0,0 +1,217 @@
+"""
+Response cache for read-heavy gateway GET routes.
+
+Entries are keyed by "<user_id>:<route path>" so a write for a user can drop
+every cached read of that user's data by prefix. Two backends are available:
+an in-process LRU with TTL (default) and Redis, selected with
+RESPONSE_CACHE_BACKEND=memory|redis|none.
+
+Every invalidation also bumps the user's generation. A read records the
+generation before fetching and does not store its result if the generation
+moved meanwhile, since the data may predate the write.
+
+Agents answer some failed reads with 200 and a fallback body flagged by
+"_error" or "_offline_mode" (e.g. an empty profile while the database is
+down); those are served but never cached.
+"""
+
+import json
+import os
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import httpx
+from fastapi.responses import Response
+
+from upstream import relay_headers
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Users whose generation is tracked in process; older ones are forgotten safely
+RESPONSE_CACHE_MAX_GENERATIONS = int(os.getenv("RESPONSE_CACHE_MAX_GENERATIONS", "10000"))
+# Top-level keys agents add to a 200 body that is a fallback rather than real data
+DEGRADED_BODY_KEYS = ("_error", "_offline_mode")
+
+
+class CachedResponse:
+    """An agent response reduced to what is needed to replay it"""
+
+    def __init__(self, status_code: int, body: bytes, headers: Dict[str, str]):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+
+    @classmethod
+    def from_upstream(cls, response: httpx.Response) -> "CachedResponse":
+        return cls(response.status_code, response.content, relay_headers(response.headers))
+
+    @property
+    def cacheable(self) -> bool:
+        """Whether this is a real successful read, not an error or an agent's degraded fallback"""
+        if self.status_code != 200:
+            return False
+        if not self.headers.get("content-type", "").startswith("application/json"):
+            return True
+        try:
+            body = json.loads(self.body)
+        except ValueError:
+            return True
+        return not (isinstance(body, dict) and any(key in body for key in DEGRADED_BODY_KEYS))
+
+    def to_response(self, cache_status: str) -> Response:
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            headers={**self.headers, "X-Cache": cache_status},
+        )
+
+    def dumps(self) -> bytes:
+        meta = json.dumps({"status_code": self.status_code, "headers": self.headers}).encode()
+        return meta + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        meta, _, body = raw.partition(b"\n")
+        data = json.loads(meta)
+        return cls(data["status_code"], body, data["headers"])
+
+
+class NullCache:
+    """Cache backend that never stores anything"""
+
+    def __init__(self):
+        # Generations are kept even without a cache: request coalescing keys on them too
+        self.generations: "OrderedDict[str, int]" = OrderedDict()
+        self.generation_clock = 0
+        self.generation_floor = 0
+
+    async def generation(self, user_id: str) -> Optional[int]:
+        """The user's current generation; None when it cannot be read"""
+        return self.generations.get(user_id, self.generation_floor)
+
+    async def bump_generation(self, user_id: str):
+        self.generation_clock += 1
+        self.generations[user_id] = self.generation_clock
+        self.generations.move_to_end(user_id)
+        while len(self.generations) > RESPONSE_CACHE_MAX_GENERATIONS:
+            _, forgotten = self.generations.popitem(last=False)
+            # Untracked users report at least the newest forgotten generation,
+            # so a read that straddled a forgotten bump still sees a change
+            self.generation_floor = max(self.generation_floor, forgotten)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        return None
+
+    async def set(self, key: str, value: CachedResponse, ttl: float = RESPONSE_CACHE_TTL):
+        pass
+
+    async def invalidate_prefix(self, prefix: str):
+        pass
+
+    async def close(self):
+        pass
+
+
+class InMemoryCache(NullCache):
+    """Size-bounded LRU cache with per-entry TTL"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, CachedResponse]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: CachedResponse, ttl: float = RESPONSE_CACHE_TTL):
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def invalidate_prefix(self, prefix: str):
+        for key in [key for key in self.entries if key.startswith(prefix)]:
+            del self.entries[key]
+
+
+class RedisCache(NullCache):
+    """Redis-backed cache shared by every gateway process"""
+
+    KEY_PREFIX = "gateway:cache:"
+    GENERATION_PREFIX = "gateway:generation:"
+    GENERATION_TTL = 24 * 3600
+
+    def __init__(self, url: str = REDIS_URL):
+        super().__init__()
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+
+    async def generation(self, user_id: str) -> Optional[int]:
+        try:
+            raw = await self.redis.get(self.GENERATION_PREFIX + user_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis generation read failed: {e}")
+            return None
+        return int(raw) if raw else 0
+
+    async def bump_generation(self, user_id: str):
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.incr(self.GENERATION_PREFIX + user_id).expire(self.GENERATION_PREFIX + user_id, self.GENERATION_TTL).execute()
+        except Exception as e:
+            logger.warning(f"⚠️ Redis generation bump failed: {e}")
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        try:
+            raw = await self.redis.get(self.KEY_PREFIX + key)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis cache read failed: {e}")
+            return None
+        return CachedResponse.loads(raw) if raw else None
+
+    async def set(self, key: str, value: CachedResponse, ttl: float = RESPONSE_CACHE_TTL):
+        try:
+            await self.redis.set(self.KEY_PREFIX + key, value.dumps(), px=int(ttl * 1000))
+        except Exception as e:
+            logger.warning(f"⚠️ Redis cache write failed: {e}")
+
+    async def invalidate_prefix(self, prefix: str):
+        try:
+            pattern = self.KEY_PREFIX + re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+            keys = [key async for key in self.redis.scan_iter(match=pattern)]
+            if keys:
+                await self.redis.delete(*keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Redis cache invalidation failed: {e}")
+
+    async def close(self):
+        await self.redis.close()
+
+
+def create_response_cache() -> NullCache:
+    """Build the cache backend selected by RESPONSE_CACHE_BACKEND"""
+    if RESPONSE_CACHE_BACKEND == "none":
+        return NullCache()
+    if RESPONSE_CACHE_BACKEND == "redis":
+        try:
+            cache = RedisCache()
+            logger.info("✅ Redis response cache enabled")
+            return cache
+        except ImportError:
+            logger.warning("⚠️ redis library not installed, falling back to in-memory cache")
+    return InMemoryCache()
@@ -0,0 +1,151 @@
+"""
+Adaptive concurrency limits for agent services.
+
+Each agent gets a limit on how many requests the gateway may have in flight to
+it. The limit follows AIMD driven by observed latency: it grows by one per
+window of successful calls while the agent is kept busy, and is cut
+multiplicatively when calls fail or the short-term latency average climbs well
+above the long-term one, which is the sign of requests queueing inside the
+agent. Requests beyond the limit wait in a short bounded queue and are rejected
+with 503 when the queue is full or the wait runs out.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from shared.metrics import REGISTRY, Counter, Gauge
+
+CONCURRENCY_INITIAL_LIMIT = int(os.getenv("CONCURRENCY_INITIAL_LIMIT", "20"))
+CONCURRENCY_MIN_LIMIT = int(os.getenv("CONCURRENCY_MIN_LIMIT", "2"))
+CONCURRENCY_MAX_LIMIT = int(os.getenv("CONCURRENCY_MAX_LIMIT", "200"))
+CONCURRENCY_BACKOFF = float(os.getenv("CONCURRENCY_BACKOFF", "0.9"))
+# Short-term latency above this multiple of the long-term average counts as congestion
+CONCURRENCY_LATENCY_TOLERANCE = float(os.getenv("CONCURRENCY_LATENCY_TOLERANCE", "2.0"))
+CONCURRENCY_MAX_QUEUE = int(os.getenv("CONCURRENCY_MAX_QUEUE", "50"))
+CONCURRENCY_QUEUE_TIMEOUT = float(os.getenv("CONCURRENCY_QUEUE_TIMEOUT", "5"))
+
+SHORT_LATENCY_ALPHA = 0.2
+LONG_LATENCY_ALPHA = 0.02
+
+CONCURRENCY_LIMIT = Gauge("upstream_concurrency_limit", "Current adaptive concurrency limit per agent", ("service", "agent"))
+UPSTREAM_IN_FLIGHT = Gauge("upstream_requests_in_flight", "Requests in flight to each agent", ("service", "agent"))
+UPSTREAM_QUEUE_DEPTH = Gauge("upstream_queue_depth", "Requests waiting for a concurrency slot per agent", ("service", "agent"))
+UPSTREAM_REJECTED = Counter("upstream_rejected_total", "Requests rejected by the concurrency limiter per agent", ("service", "agent"))
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        agent_name: str,
+        service: str = "api-gateway",
+        initial_limit: int = CONCURRENCY_INITIAL_LIMIT,
+        min_limit: int = CONCURRENCY_MIN_LIMIT,
+        max_limit: int = CONCURRENCY_MAX_LIMIT,
+        max_queue: int = CONCURRENCY_MAX_QUEUE,
+        queue_timeout: float = CONCURRENCY_QUEUE_TIMEOUT,
+    ):
+        self.agent_name = agent_name
+        self.service = service
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.estimated_limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.inflight = 0
+        self.waiters: "deque[asyncio.Future]" = deque()
+        self.short_latency_ms = 0.0
+        self.long_latency_ms = 0.0
+        self.last_decrease = 0.0
+        self.rejected = 0
+        REGISTRY.add_collector(self._publish)
+
+    @property
+    def limit(self) -> int:
+        return int(self.estimated_limit)
+
+    async def acquire(self):
+        """Take an in-flight slot, waiting briefly in the queue when the agent is at its limit"""
+        if self.inflight < self.limit and not self.waiters:
+            self.inflight += 1
+            return
+        if len(self.waiters) >= self.max_queue:
+            raise self._overloaded()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # The releasing request hands its slot over, so inflight is already counted
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._overloaded()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def release(self, latency_ms: float, ok: bool):
+        """Return a slot and adjust the limit from the call's outcome"""
+        saturated = self.inflight >= self.limit
+        self._adjust(latency_ms, ok, saturated)
+        self._release_slot()
+
+    def cancel(self):
+        """Return a slot without judging the agent, for calls that never reached it"""
+        self._release_slot()
+
+    def _release_slot(self):
+        self.inflight -= 1
+        while self.waiters and self.inflight < self.limit:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def _adjust(self, latency_ms: float, ok: bool, saturated: bool):
+        if self.long_latency_ms == 0.0:
+            self.short_latency_ms = self.long_latency_ms = latency_ms
+        else:
+            self.short_latency_ms += SHORT_LATENCY_ALPHA * (latency_ms - self.short_latency_ms)
+            self.long_latency_ms += LONG_LATENCY_ALPHA * (latency_ms - self.long_latency_ms)
+
+        congested = self.short_latency_ms > self.long_latency_ms * CONCURRENCY_LATENCY_TOLERANCE
+        if not ok or congested:
+            now = time.monotonic()
+            # Back off at most once per typical round trip so one burst does not collapse the limit
+            if (now - self.last_decrease) * 1000 >= self.short_latency_ms:
+                self.estimated_limit = max(float(self.min_limit), self.estimated_limit * CONCURRENCY_BACKOFF)
+                self.last_decrease = now
+        elif saturated:
+            # Additive increase: about one extra slot per limit's worth of successful calls
+            self.estimated_limit = min(float(self.max_limit), self.estimated_limit + 1 / self.estimated_limit)
+
+    def _overloaded(self) -> HTTPException:
+        self.rejected += 1
+        UPSTREAM_REJECTED.labels(service=self.service, agent=self.agent_name).inc()
+        return HTTPException(
+            status_code=503,
+            detail=f"Agent {self.agent_name} is at capacity, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    def _publish(self):
+        CONCURRENCY_LIMIT.labels(service=self.service, agent=self.agent_name).set(self.limit)
+        UPSTREAM_IN_FLIGHT.labels(service=self.service, agent=self.agent_name).set(self.inflight)
+        UPSTREAM_QUEUE_DEPTH.labels(service=self.service, agent=self.agent_name).set(len(self.waiters))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "inflight": self.inflight,
+            "queue_depth": len(self.waiters),
+            "rejected": self.rejected,
+            "short_latency_ms": round(self.short_latency_ms, 2),
+            "long_latency_ms": round(self.long_latency_ms, 2),
+        }
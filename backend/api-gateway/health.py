@@ -0,0 +1,114 @@
+"""
+Background health prober for agent services.
+
+All agent replicas are probed concurrently on a fixed interval and the results
+are kept as a snapshot, so the gateway's /health endpoint answers from memory
+instead of calling every agent in turn. Probe outcomes also feed each replica's
+circuit breaker.
+"""
+
+import asyncio
+import os
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import httpx
+
+from upstream import build_timeout
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "10"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+
+
+class HealthProber:
+    def __init__(self, registry, interval: float = HEALTH_PROBE_INTERVAL, timeout: float = HEALTH_PROBE_TIMEOUT):
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.results: Dict[str, Dict[str, Any]] = {
+            replica.url: {"status": "unknown"}
+            for pool in registry.pools.values()
+            for replica in pool.replicas
+        }
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start probing in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"❤️ Health prober started (every {self.interval}s)")
+
+    async def stop(self):
+        """Stop the background probe loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"💥 Health probe round failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def probe_all(self):
+        """Probe every replica of every agent concurrently"""
+        await asyncio.gather(*(
+            self.probe(agent_name, replica)
+            for agent_name, pool in self.registry.pools.items()
+            for replica in pool.replicas
+        ))
+        self.last_run = datetime.utcnow()
+
+    async def probe(self, agent_name: str, replica):
+        """Probe a single replica and record the result"""
+        breaker = replica.breaker
+        checked_at = datetime.utcnow().isoformat()
+        try:
+            client = self.registry.get(agent_name)
+            response = await client.get(
+                f"{replica.url}/health",
+                timeout=build_timeout(self.timeout)
+            )
+            healthy = response.status_code == 200
+            result = {
+                "status": "healthy" if healthy else "unhealthy",
+                "response_code": response.status_code,
+            }
+            # A replica reporting itself unhealthy stays out of rotation
+            if healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        except httpx.HTTPError as e:
+            result = {"status": "unhealthy", "error": str(e) or e.__class__.__name__}
+            breaker.record_failure()
+
+        result["checked_at"] = checked_at
+        self.results[replica.url] = result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Latest probe result per agent with its concurrency limit and live per-replica stats"""
+        services = {}
+        for agent_name, pool in self.registry.pools.items():
+            replicas = [
+                {**self.results.get(replica.url, {"status": "unknown"}), **replica.snapshot()}
+                for replica in pool.replicas
+            ]
+            healthy = sum(1 for replica in replicas if replica["status"] == "healthy")
+            services[agent_name] = {
+                "status": "healthy" if healthy else "unhealthy",
+                "healthy_replicas": healthy,
+                "concurrency": self.registry.limiters[agent_name].snapshot(),
+                "replicas": replicas,
+            }
+        return services
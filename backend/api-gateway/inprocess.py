@@ -0,0 +1,68 @@
+"""
+In-process mode for the API Gateway.
+
+With GATEWAY_MODE=inprocess the agent FastAPI apps are imported into the
+gateway process and called through httpx's ASGI transport instead of over
+HTTP. Everything runs on one event loop with one shared database pool, which
+suits small deployments and load tests. Agents that cannot be imported, for
+example because an optional dependency is missing, keep their HTTP URLs.
+"""
+
+import importlib.util
+import logging
+import os
+import sys
+from contextlib import AsyncExitStack
+from typing import Dict
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_MODE = os.getenv("GATEWAY_MODE", "microservices").lower()
+
+AGENTS_DIR = os.path.join(os.path.dirname(__file__), "..", "agents")
+
+# Gateway agent name -> entry module of the agent's FastAPI app
+AGENT_APP_PATHS = {
+    "resume-analyzer": os.path.join(AGENTS_DIR, "resume-analyzer", "main.py"),
+    "profile-service": os.path.join(AGENTS_DIR, "profile-service", "main.py"),
+    "course-generation": os.path.join(AGENTS_DIR, "course-service", "main.py"),
+}
+
+
+def inprocess_url(agent_name: str) -> str:
+    """Replica URL for an agent served in-process; the host only names it"""
+    return f"http://{agent_name}"
+
+
+def load_agent_app(agent_name: str, path: str) -> FastAPI:
+    """Import an agent's main.py under a unique module name and return its app"""
+    module_name = "agent_" + agent_name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[module_name]
+        raise
+    return module.app
+
+
+def load_agent_apps(paths: Dict[str, str] = AGENT_APP_PATHS) -> Dict[str, FastAPI]:
+    """Load every agent app that imports cleanly"""
+    apps = {}
+    for agent_name, path in paths.items():
+        try:
+            apps[agent_name] = load_agent_app(agent_name, path)
+            logger.info(f"🧩 Mounted {agent_name} in-process")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load {agent_name} in-process, keeping HTTP: {e}")
+    return apps
+
+
+async def start_agent_apps(apps: Dict[str, FastAPI], stack: AsyncExitStack):
+    """Run each agent's startup, registering its shutdown on the exit stack"""
+    for agent_name, agent_app in apps.items():
+        await stack.enter_async_context(agent_app.router.lifespan_context(agent_app))
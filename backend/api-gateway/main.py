@@ -1,18 +1,115 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import httpx
 import os
+import sys
 import logging
+from contextlib import AsyncExitStack, asynccontextmanager
 from typing import Optional
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 
+# Add the backend directory to the path for shared module imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from shared.deadline import DeadlineMiddleware
+from shared.metrics import instrument_app
+from shared.tracing import TracingMiddleware
+
+from upstream import UPSTREAM_DEFAULT_TIMEOUT, AgentClientRegistry, relay_response
+from replicas import parse_replicas
+from health import HealthProber
+from cache import CachedResponse, create_response_cache
+from singleflight import SingleFlight
+from token_cache import VerifiedTokenCache, token_digest
+from batch import BatchExecutor, BatchRequest
+from inprocess import GATEWAY_MODE, inprocess_url, load_agent_apps, start_agent_apps
+from ratelimit import LoadShedMiddleware, create_rate_limiter, enforce_rate_limit, parse_rate
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="StudyMate API Gateway - Supabase Edition", version="2.0.0")
+# Agent service URLs - Local development setup
+# Each variable may hold a comma-separated list of replica URLs
+AGENT_SERVICES = {
+    "resume-analyzer": parse_replicas(os.getenv("RESUME_ANALYZER_URL", "http://localhost:8003")),
+    "profile-service": parse_replicas(os.getenv("PROFILE_SERVICE_URL", "http://localhost:8006")),
+    "course-generation": parse_replicas(os.getenv("COURSE_GENERATION_URL", "http://localhost:8001")),
+    "interview-coach": parse_replicas(os.getenv("INTERVIEW_COACH_URL", "http://localhost:8002")),
+}
+
+# GATEWAY_MODE=inprocess serves the agents from this process over ASGI instead of HTTP
+agent_apps = load_agent_apps() if GATEWAY_MODE == "inprocess" else {}
+for agent_name in agent_apps:
+    AGENT_SERVICES[agent_name] = [inprocess_url(agent_name)]
+
+# Per-route upstream timeouts (seconds)
+ROUTE_TIMEOUTS = {
+    "default": UPSTREAM_DEFAULT_TIMEOUT,
+    "resume-analyze": float(os.getenv("TIMEOUT_RESUME_ANALYZE", "60")),
+    "resume-analyze-groq": float(os.getenv("TIMEOUT_RESUME_ANALYZE_GROQ", "120")),
+    "profile-extract": float(os.getenv("TIMEOUT_PROFILE_EXTRACT", "60")),
+    "profile": float(os.getenv("TIMEOUT_PROFILE", "30")),
+    "quick-suggestions": float(os.getenv("TIMEOUT_QUICK_SUGGESTIONS", "30")),
+    "resume-jobs": float(os.getenv("TIMEOUT_RESUME_JOBS", "30")),
+    "resume-fused": float(os.getenv("TIMEOUT_RESUME_FUSED", "90")),
+}
+
+# Per-caller token buckets for LLM-backed routes, as "<requests>/<seconds>"
+RATE_LIMITS = {
+    "course-generate": parse_rate(os.getenv("RATE_LIMIT_COURSE_GENERATE", "5/60")),
+    "resume-analyze": parse_rate(os.getenv("RATE_LIMIT_RESUME_ANALYZE", "10/60")),
+    "profile-extract": parse_rate(os.getenv("RATE_LIMIT_PROFILE_EXTRACT", "10/60")),
+    "quick-suggestions": parse_rate(os.getenv("RATE_LIMIT_QUICK_SUGGESTIONS", "20/60")),
+}
+
+# Pooled upstream clients, one per agent
+agent_clients = AgentClientRegistry(AGENT_SERVICES, agent_apps, service="api-gateway")
+health_prober = HealthProber(agent_clients)
+
+# Cache for read-heavy GET routes, invalidated by the matching writes
+response_cache = create_response_cache()
+
+# Identical GETs in flight at the same time share one upstream call
+inflight_gets = SingleFlight()
+
+rate_limiter = create_rate_limiter()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create pooled upstream clients and start health probing on startup"""
+    async with AsyncExitStack() as agent_lifespans:
+        # In-process agents start before the gateway and stop after it
+        await start_agent_apps(agent_apps, agent_lifespans)
+        await agent_clients.start()
+        await health_prober.start()
+        logger.info(f"🚀 API Gateway started successfully ({GATEWAY_MODE} mode)")
+        
+        yield
+        
+        await health_prober.stop()
+        await batch_executor.close()
+        await agent_clients.close()
+        await response_cache.close()
+        await rate_limiter.close()
+        logger.info("🛑 API Gateway shutdown complete")
+
+app = FastAPI(title="StudyMate API Gateway - Supabase Edition", version="2.0.0", lifespan=lifespan)
+
+# Sub-requests of POST /batch are dispatched in-process through this app
+batch_executor = BatchExecutor(app)
+
+# Shed load with 503 once too many requests are in flight (added first so CORS wraps it)
+app.add_middleware(LoadShedMiddleware)
+
+# Clients may send X-Request-Timeout-Ms to cap every upstream call made for them
+app.add_middleware(DeadlineMiddleware)
+
+# Request latency histograms and upstream metrics at GET /metrics
+instrument_app(app, service="api-gateway")
+
+# Trace ids are generated here and propagated to every agent call
+app.add_middleware(TracingMiddleware, service="api-gateway")
 
 # CORS middleware
 app.add_middleware(
@@ -26,18 +123,13 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
-# Agent service URLs - Local development setup
-AGENT_SERVICES = {
-    "resume-analyzer": os.getenv("RESUME_ANALYZER_URL", "http://localhost:8003"),
-    "profile-service": os.getenv("PROFILE_SERVICE_URL", "http://localhost:8006"),
-    "course-generation": os.getenv("COURSE_GENERATION_URL", "http://localhost:8001"),
-    "interview-coach": os.getenv("INTERVIEW_COACH_URL", "http://localhost:8002"),
-}
-
 # JWT Configuration
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 
+# Verified tokens are cached until their exp so jwt.decode runs once per token
+token_cache = VerifiedTokenCache()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -49,36 +141,99 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    digest = token_digest(credentials.credentials)
+    if token_cache.is_revoked(digest):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    cached_user_id = token_cache.get(digest)
+    if cached_user_id is not None:
+        return cached_user_id
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
+        if payload.get("exp") is not None:
+            token_cache.put(digest, user_id, float(payload["exp"]))
         return user_id
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-async def forward_to_agent(agent_name: str, path: str, method: str = "GET", data: dict = None, headers: dict = None):
-    """Forward request to specific agent service"""
-    if agent_name not in AGENT_SERVICES:
-        raise HTTPException(status_code=404, detail=f"Agent {agent_name} not found")
+def rate_limit_caller(request: Request) -> str:
+    """Identify the caller for rate limiting: the token's user when valid, else the client IP"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{verify_token(HTTPAuthorizationCredentials(scheme=scheme, credentials=token))}"
+        except HTTPException:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def rate_limited(route: str):
+    """Route dependency that spends one token from the caller's bucket for route"""
+    async def check(request: Request):
+        await enforce_rate_limit(rate_limiter, route, rate_limit_caller(request), RATE_LIMITS)
+    return Depends(check)
+
+async def forward_to_agent(agent_name: str, path: str, method: str = "GET", data: dict = None, headers: dict = None, timeout: float = None, decode: bool = False):
+    """Forward request to specific agent service using its pooled client.
+
+    By default the agent's bytes, status code and content headers are relayed
+    unchanged. Pass decode=True only when the gateway needs to inspect the body.
+    """
+    if method not in ("GET", "POST", "PUT", "DELETE"):
+        raise HTTPException(status_code=405, detail="Method not allowed")
     
-    agent_url = AGENT_SERVICES[agent_name]
-    url = f"{agent_url}{path}"
+    response = await agent_clients.request(
+        agent_name,
+        method,
+        path,
+        timeout=timeout if timeout is not None else ROUTE_TIMEOUTS["default"],
+        json=data if method in ("POST", "PUT") else None,
+        headers=headers
+    )
     
-    async with httpx.AsyncClient() as client:
-        if method == "GET":
-            response = await client.get(url, headers=headers)
-        elif method == "POST":
-            response = await client.post(url, json=data, headers=headers)
-        elif method == "PUT":
-            response = await client.put(url, json=data, headers=headers)
-        elif method == "DELETE":
-            response = await client.delete(url, headers=headers)
-        else:
-            raise HTTPException(status_code=405, detail="Method not allowed")
+    if decode:
+        return response.json()
+    return relay_response(response)
+
+async def cached_get(user_id: str, route: str, agent_name: str, path: str, timeout: float = None):
+    """GET through the response cache, keyed by user and gateway route.
+
+    Only successful responses are cached, not agents' degraded fallbacks (see
+    CachedResponse.cacheable); writes drop entries via invalidate_user_cache.
+    Concurrent misses for the same key are coalesced into a single upstream call.
+    """
+    cache_key = f"{user_id}:{route}"
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        return cached.to_response("HIT")
+    generation = await response_cache.generation(user_id)
     
-    return response.json()
+    async def fetch() -> CachedResponse:
+        response = await agent_clients.request(
+            agent_name,
+            "GET",
+            path,
+            timeout=timeout if timeout is not None else ROUTE_TIMEOUTS["default"]
+        )
+        entry = CachedResponse.from_upstream(response)
+        # A write since the fetch started may make this data stale: serve it, but don't keep it
+        if entry.cacheable and generation is not None and await response_cache.generation(user_id) == generation:
+            await response_cache.set(cache_key, entry)
+            if await response_cache.generation(user_id) != generation:
+                # A write landed while storing
+                await response_cache.invalidate_prefix(cache_key)
+        return entry
+    
+    # Only requests that started after the same invalidations share a fetch
+    entry = await inflight_gets.do(f"{cache_key}#{generation}", fetch)
+    return entry.to_response("MISS")
+
+async def invalidate_user_cache(user_id: str, route_prefix: str):
+    """Drop cached GET responses for a user under a route prefix"""
+    # Bump first, so reads already in flight do not store what is about to be dropped
+    await response_cache.bump_generation(user_id)
+    await response_cache.invalidate_prefix(f"{user_id}:{route_prefix}")
 
 @app.get("/")
 async def root():
@@ -91,28 +246,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check with service status"""
-    service_health = {}
-    
-    # Check each service health
-    for service_name, service_url in AGENT_SERVICES.items():
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{service_url}/health")
-                service_health[service_name] = {
-                    "status": "healthy" if response.status_code == 200 else "unhealthy",
-                    "response_code": response.status_code
-                }
-        except Exception as e:
-            service_health[service_name] = {
-                "status": "unhealthy",
-                "error": str(e)
-            }
-    
+    """Health check served from the background prober's latest snapshot"""
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow(),
-        "services": service_health,
+        "last_probe": health_prober.last_run,
+        "services": health_prober.snapshot(),
         "database": "supabase_postgresql"
     }
 
@@ -163,26 +302,43 @@ async def sign_up(user_data: dict):
     }
 
 @app.post("/auth/signout")
-async def sign_out(user_id: str = Depends(verify_token)):
+async def sign_out(credentials: HTTPAuthorizationCredentials = Depends(security), user_id: str = Depends(verify_token)):
+    token_cache.revoke(token_digest(credentials.credentials))
     return {"message": "Signed out successfully"}
 
+# Batch Route
+@app.post("/batch")
+async def run_batch(
+    batch_request: BatchRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(verify_token)
+):
+    """Run several gateway calls concurrently in one round trip.
+
+    The token is verified once here; sub-requests reuse it and hit the verified-token cache.
+    """
+    responses = await batch_executor.run(batch_request, f"Bearer {credentials.credentials}")
+    return {"responses": responses}
+
 # Course Generation Routes
-@app.post("/courses/generate")
+@app.post("/courses/generate", dependencies=[rate_limited("course-generate")])
 async def generate_course(course_data: dict, user_id: str = Depends(verify_token)):
     course_data["user_id"] = user_id
-    return await forward_to_agent("course-generation", "/generate", "POST", course_data)
+    response = await forward_to_agent("course-generation", "/generate", "POST", course_data)
+    await invalidate_user_cache(user_id, "/courses")
+    return response
 
 @app.get("/courses")
 async def get_courses(user_id: str = Depends(verify_token)):
-    return await forward_to_agent("course-generation", f"/courses?user_id={user_id}", "GET")
+    return await cached_get(user_id, "/courses", "course-generation", f"/courses?user_id={user_id}")
 
 @app.get("/courses/{course_id}")
 async def get_course(course_id: str, user_id: str = Depends(verify_token)):
-    return await forward_to_agent("course-generation", f"/courses/{course_id}", "GET")
+    return await cached_get(user_id, f"/courses/{course_id}", "course-generation", f"/courses/{course_id}")
 
 @app.get("/courses/{course_id}/content")
 async def get_course_content(course_id: str, user_id: str = Depends(verify_token)):
-    return await forward_to_agent("course-generation", f"/courses/{course_id}/content", "GET")
+    return await cached_get(user_id, f"/courses/{course_id}/content", "course-generation", f"/courses/{course_id}/content")
 
 # Interview Routes
 @app.post("/interviews/start")
@@ -213,91 +369,95 @@ async def send_message(message_data: dict, user_id: str = Depends(verify_token))
 async def get_progress(user_id: str = Depends(verify_token)):
     return await forward_to_agent("progress-analyst", f"/progress?user_id={user_id}", "GET")
 
+# Upload routes stream the multipart body straight through to the agent,
+# so the form fields are documented here instead of parsed by the gateway.
+def multipart_upload_schema(required_fields: list, optional_fields: list = ()) -> dict:
+    """OpenAPI request body for a streamed resume upload"""
+    properties = {"resume": {"type": "string", "format": "binary"}}
+    for field in [*required_fields, *optional_fields]:
+        properties[field] = {"type": "string"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": properties,
+                        "required": ["resume", *required_fields],
+                    }
+                }
+            },
+        }
+    }
+
 # Resume Analyzer Routes
-@app.post("/resume/analyze")
-async def analyze_resume(
-    resume: UploadFile = File(...),
-    job_role: str = Form(...),
-    job_description: str = Form(""),
-    user_id: Optional[str] = Form(None)
-):
+@app.post("/resume/analyze", dependencies=[rate_limited("resume-analyze")], openapi_extra=multipart_upload_schema(["job_role"], ["job_description", "user_id"]))
+async def analyze_resume(request: Request):
     """Analyze resume for specific job role"""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        files = {"resume": (resume.filename, await resume.read(), resume.content_type)}
-        data = {
-            "job_role": job_role,
-            "job_description": job_description,
-            "user_id": user_id or "demo"
-        }
-        response = await client.post(f"{AGENT_SERVICES['resume-analyzer']}/analyze-resume", files=files, data=data)
-        return response.json()
+    return await agent_clients.stream("resume-analyzer", "/analyze-resume", request, ROUTE_TIMEOUTS["resume-analyze"])
+
+@app.post("/resume/analyze-and-extract", dependencies=[rate_limited("resume-analyze")], openapi_extra=multipart_upload_schema(["job_role"], ["job_description", "user_id", "single_call"]))
+async def analyze_and_extract_resume(request: Request):
+    """Analyze a resume and extract profile data from a single upload"""
+    return await agent_clients.stream("resume-analyzer", "/analyze-and-extract", request, ROUTE_TIMEOUTS["resume-fused"])
+
+# Asynchronous resume analysis jobs: submit returns a job id, then poll or subscribe
+@app.post("/resume/jobs", status_code=202, dependencies=[rate_limited("resume-analyze")], openapi_extra=multipart_upload_schema(["job_role"], ["job_description", "user_id"]))
+async def submit_resume_job(request: Request):
+    """Queue a resume analysis and return its job id immediately"""
+    return await agent_clients.stream("resume-analyzer", "/jobs/analyze-resume", request, ROUTE_TIMEOUTS["resume-jobs"])
+
+@app.get("/resume/jobs/{job_id}")
+async def get_resume_job(job_id: str):
+    """Get the status and result of a resume analysis job"""
+    return await forward_to_agent("resume-analyzer", f"/jobs/{job_id}", "GET", timeout=ROUTE_TIMEOUTS["resume-jobs"])
+
+@app.get("/resume/jobs/{job_id}/events")
+async def stream_resume_job_events(job_id: str, request: Request):
+    """Relay the analyzer's server-sent events for a job until it finishes"""
+    return await agent_clients.stream("resume-analyzer", f"/jobs/{job_id}/events", request, ROUTE_TIMEOUTS["resume-jobs"], bounded=False)
 
 # Profile Service Routes
-@app.post("/api/profile/extract-profile")
-async def extract_profile(
-    resume: UploadFile = File(...),
-    user_id: str = Form(...),
-    user_id_verified: str = Depends(verify_token)
-):
+@app.post("/api/profile/extract-profile", dependencies=[rate_limited("profile-extract")], openapi_extra=multipart_upload_schema(["user_id"]))
+async def extract_profile(request: Request, user_id_verified: str = Depends(verify_token)):
     """Extract profile data from resume using Groq AI"""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        files = {"resume": (resume.filename, await resume.read(), resume.content_type)}
-        data = {"user_id": user_id}
-        response = await client.post(f"{AGENT_SERVICES['profile-service']}/extract-profile", files=files, data=data)
-        return response.json()
+    return await agent_clients.stream("profile-service", "/extract-profile", request, ROUTE_TIMEOUTS["profile-extract"])
 
 @app.get("/api/profile/{user_id}")
 async def get_profile(user_id: str, user_id_verified: str = Depends(verify_token)):
     """Get user profile"""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.get(f"{AGENT_SERVICES['profile-service']}/profile/{user_id}")
-        return response.json()
+    return await cached_get(user_id, f"/api/profile/{user_id}", "profile-service", f"/profile/{user_id}", timeout=ROUTE_TIMEOUTS["profile"])
 
 @app.put("/api/profile/{user_id}")
 async def update_profile(user_id: str, profile_data: dict, user_id_verified: str = Depends(verify_token)):
     """Update user profile"""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.put(f"{AGENT_SERVICES['profile-service']}/profile/{user_id}", json=profile_data)
-        return response.json()
+    response = await forward_to_agent("profile-service", f"/profile/{user_id}", "PUT", profile_data, timeout=ROUTE_TIMEOUTS["profile"])
+    await invalidate_user_cache(user_id, "/api/profile/")
+    return response
 
-@app.post("/resume/extract-profile")
-async def extract_profile_data(
-    resume: UploadFile = File(...),
-    user_id: str = Form(...)
-):
+@app.post("/resume/extract-profile", dependencies=[rate_limited("profile-extract")], openapi_extra=multipart_upload_schema(["user_id"]))
+async def extract_profile_data(request: Request):
     """Extract profile data from resume (legacy endpoint)"""
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        files = {"resume": (resume.filename, await resume.read(), resume.content_type)}
-        data = {"user_id": user_id}
-        response = await client.post(f"{AGENT_SERVICES['resume-analyzer']}/extract-profile-data", files=files, data=data)
-        return response.json()
+    return await agent_clients.stream("resume-analyzer", "/extract-profile-data", request, ROUTE_TIMEOUTS["profile-extract"])
 
 # Groq Resume Analyzer Routes
-@app.post("/api/resume-groq/analyze-resume")
-async def analyze_resume_groq(
-    resume: UploadFile = File(...),
-    job_role: str = Form(...),
-    job_description: str = Form(""),
-    user_id: Optional[str] = Form(None)
-):
+@app.post("/api/resume-groq/analyze-resume", dependencies=[rate_limited("resume-analyze")], openapi_extra=multipart_upload_schema(["job_role"], ["job_description", "user_id"]))
+async def analyze_resume_groq(request: Request):
     """Analyze resume using Groq AI"""
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        files = {"resume": (resume.filename, await resume.read(), resume.content_type)}
-        data = {
-            "job_role": job_role,
-            "job_description": job_description,
-            "user_id": user_id or "demo"
-        }
-        response = await client.post(f"{AGENT_SERVICES['resume-analyzer-groq']}/analyze-resume", files=files, data=data)
-        return response.json()
+    return await agent_clients.stream("resume-analyzer-groq", "/analyze-resume", request, ROUTE_TIMEOUTS["resume-analyze-groq"])
 
-@app.post("/api/resume-groq/quick-suggestions")
+@app.post("/api/resume-groq/quick-suggestions", dependencies=[rate_limited("quick-suggestions")])
 async def get_quick_suggestions_groq(job_role: str = Form(...)):
     """Get quick suggestions for job role"""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        data = {"job_role": job_role}
-        response = await client.post(f"{AGENT_SERVICES['resume-analyzer-groq']}/quick-suggestions", data=data)
-        return response.json()
+    response = await agent_clients.request(
+        "resume-analyzer-groq",
+        "POST",
+        "/quick-suggestions",
+        timeout=ROUTE_TIMEOUTS["quick-suggestions"],
+        data={"job_role": job_role}
+    )
+    return relay_response(response)
 
 if __name__ == "__main__":
     import uvicorn
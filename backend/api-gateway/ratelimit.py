@@ -0,0 +1,206 @@
+"""
+Admission control for the gateway.
+
+Expensive LLM-backed routes are guarded by token buckets keyed by
+"<route>:<caller>", so one client cannot starve the others; a caller over its
+budget gets 429 with Retry-After. Buckets live in process memory by default or
+in Redis (RATE_LIMIT_BACKEND=memory|redis|none) so every gateway process
+shares them. Separately, LoadShedMiddleware caps the number of requests the
+gateway works on at once and answers 503 beyond that instead of queueing.
+Long-lived server-sent event streams are counted against their own cap, so
+idle job watchers cannot crowd out real calls.
+"""
+
+import json
+import math
+import os
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+GATEWAY_MAX_INFLIGHT = int(os.getenv("GATEWAY_MAX_INFLIGHT", "200"))
+GATEWAY_MAX_EVENT_STREAMS = int(os.getenv("GATEWAY_MAX_EVENT_STREAMS", "1000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+def parse_rate(value: str) -> Tuple[int, float]:
+    """Parse "<requests>/<seconds>" into (burst capacity, tokens per second)"""
+    requests, _, seconds = value.partition("/")
+    capacity = int(requests)
+    return capacity, capacity / float(seconds or 60)
+
+
+class RateLimiter:
+    """Backend that admits everything"""
+
+    async def acquire(self, key: str, capacity: int, rate: float) -> float:
+        """Take one token; returns 0 when admitted, else seconds until one is available"""
+        return 0.0
+
+    async def close(self):
+        pass
+
+
+class InMemoryRateLimiter(RateLimiter):
+    """Token buckets in this process, least recently used buckets dropped first"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(key, (float(capacity), now))
+        tokens = min(float(capacity), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            tokens -= 1
+            retry_after = 0.0
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        self.buckets.move_to_end(key)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisRateLimiter(RateLimiter):
+    """Token buckets in Redis, refilled and debited atomically by a Lua script"""
+
+    KEY_PREFIX = "gateway:ratelimit:"
+
+    # KEYS[1] = bucket; ARGV = capacity, rate (tokens/s), now (s)
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+    def __init__(self, url: str = REDIS_URL):
+        import redis.asyncio as redis
+        self.redis = redis.from_url(url)
+        self.script = self.redis.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, capacity: int, rate: float) -> float:
+        try:
+            result = await self.script(keys=[self.KEY_PREFIX + key], args=[capacity, rate, time.time()])
+        except Exception as e:
+            # Fail open: an unreachable Redis must not take the routes down with it
+            logger.warning(f"⚠️ Redis rate limit check failed: {e}")
+            return 0.0
+        return float(result)
+
+    async def close(self):
+        await self.redis.close()
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Build the rate limit backend selected by RATE_LIMIT_BACKEND"""
+    if RATE_LIMIT_BACKEND == "none":
+        return RateLimiter()
+    if RATE_LIMIT_BACKEND == "redis":
+        try:
+            limiter = RedisRateLimiter()
+            logger.info("✅ Redis rate limiter enabled")
+            return limiter
+        except ImportError:
+            logger.warning("⚠️ redis library not installed, falling back to in-memory rate limiter")
+    return InMemoryRateLimiter()
+
+
+async def enforce_rate_limit(limiter: RateLimiter, route: str, caller: str, limits: Dict[str, Tuple[int, float]]):
+    """Raise 429 with Retry-After when the caller's bucket for this route is empty"""
+    capacity, rate = limits[route]
+    retry_after = await limiter.acquire(f"{route}:{caller}", capacity, rate)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+# Scope flag set on requests the gateway sends to itself, such as batch sub-requests
+INTERNAL_REQUEST_SCOPE_KEY = "gateway.internal_request"
+
+# Routes that hold a server-sent event stream open until a job finishes
+EVENT_STREAM_PATHS = (re.compile(r"^/resume/jobs/[^/]+/events$"),)
+
+
+class LoadShedMiddleware:
+    """Reject requests with 503 once too many are already in flight.
+
+    A request counts until its response body has been fully sent, so long
+    streaming uploads and downloads are included. Internal requests are not
+    counted: their parent request already holds a slot. Event streams, which
+    mostly sit idle, count against max_event_streams instead of max_inflight.
+    """
+
+    def __init__(self, app, max_inflight: int = GATEWAY_MAX_INFLIGHT, exempt_paths: Tuple[str, ...] = ("/", "/health", "/metrics"),
+                 max_event_streams: int = GATEWAY_MAX_EVENT_STREAMS, event_stream_paths: Tuple[re.Pattern, ...] = EVENT_STREAM_PATHS):
+        self.app = app
+        self.max_inflight = max_inflight
+        self.exempt_paths = exempt_paths
+        self.max_event_streams = max_event_streams
+        self.event_stream_paths = event_stream_paths
+        self.inflight = 0
+        self.event_streams = 0
+        self.shed = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths or scope.get(INTERNAL_REQUEST_SCOPE_KEY):
+            await self.app(scope, receive, send)
+            return
+        if any(pattern.match(scope["path"]) for pattern in self.event_stream_paths):
+            if self.max_event_streams > 0 and self.event_streams >= self.max_event_streams:
+                await self.reject(send)
+                return
+            self.event_streams += 1
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.event_streams -= 1
+            return
+        if self.max_inflight > 0 and self.inflight >= self.max_inflight:
+            await self.reject(send)
+            return
+        self.inflight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inflight -= 1
+
+    async def reject(self, send):
+        self.shed += 1
+        body = json.dumps({"detail": "Gateway is overloaded, please retry shortly"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,105 @@
+"""
+Replica pools for agent services.
+
+Each agent can be served by several processes. Requests are balanced with
+power-of-two-choices on outstanding requests, and every replica has its own
+circuit breaker so a failing process is ejected from rotation until a trial
+call succeeds again.
+"""
+
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
+
+# Weight of the newest sample in the latency moving average
+LATENCY_EWMA_ALPHA = float(os.getenv("LATENCY_EWMA_ALPHA", "0.2"))
+
+
+def parse_replicas(value: str) -> List[str]:
+    """Split a comma-separated list of replica URLs"""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.breaker = CircuitBreaker()
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ewma_latency_ms = 0.0
+        self.last_latency_ms = 0.0
+
+    def available(self) -> bool:
+        """Whether the balancer may pick this replica"""
+        state = self.breaker.state
+        return state == CLOSED or (state == HALF_OPEN and not self.breaker.trial_in_flight)
+
+    def begin(self) -> float:
+        self.outstanding += 1
+        self.requests += 1
+        return time.perf_counter()
+
+    def end(self, started: float, ok: Optional[bool]):
+        """Finish a call begun with begin(); ok=None when it ended without an answer to judge"""
+        self.outstanding -= 1
+        if ok is None:
+            self.breaker.release_trial()
+            return
+        latency_ms = (time.perf_counter() - started) * 1000
+        self.last_latency_ms = latency_ms
+        if self.ewma_latency_ms == 0.0:
+            self.ewma_latency_ms = latency_ms
+        else:
+            self.ewma_latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - self.ewma_latency_ms)
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "circuit": self.breaker.snapshot(),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 2),
+            "last_latency_ms": round(self.last_latency_ms, 2),
+        }
+
+
+class ReplicaPool:
+    def __init__(self, agent_name: str, urls: List[str]):
+        self.agent_name = agent_name
+        self.replicas = [Replica(url) for url in urls]
+
+    def choose(self, exclude: Replica = None) -> Replica:
+        """Pick a replica with power-of-two-choices on outstanding requests.
+
+        Raises 503 with Retry-After when every replica is ejected.
+        """
+        candidates = [r for r in self.replicas if r is not exclude and r.available()]
+        if not candidates:
+            retry_after = min((r.breaker.retry_after() for r in self.replicas), default=1)
+            raise HTTPException(
+                status_code=503,
+                detail=f"Agent {self.agent_name} is temporarily unavailable",
+                headers={"Retry-After": str(retry_after)},
+            )
+        if len(candidates) == 1:
+            chosen = candidates[0]
+        else:
+            first, second = random.sample(candidates, 2)
+            chosen = min(first, second, key=lambda r: (r.outstanding, r.ewma_latency_ms))
+        chosen.breaker.allow_request()
+        return chosen
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        return [replica.snapshot() for replica in self.replicas]
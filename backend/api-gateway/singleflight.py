@@ -0,0 +1,34 @@
+"""
+Request coalescing for identical in-flight upstream calls.
+
+When several clients ask for the same key at once, only the first call goes
+upstream; the others wait on the same task and share its result or error.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once per key at a time and share the outcome with every caller.
+
+        The shared call runs as its own task, so a caller that disconnects does
+        not cancel the upstream request for the others still waiting on it.
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self.calls.get(key) is task:
+            del self.calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every waiter has gone away
+            task.exception()
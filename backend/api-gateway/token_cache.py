@@ -0,0 +1,65 @@
+"""
+Cache of verified JWTs for the gateway's verify_token dependency.
+
+A token that has been decoded once is remembered by its SHA-256 digest until
+its own exp claim, so repeat requests skip jwt.decode. Signed-out tokens go
+into a revocation set that is checked before the cache, also until their exp.
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+# Fallback lifetime for revoked tokens whose exp is unknown (matches create_access_token)
+DEFAULT_TOKEN_LIFETIME = 24 * 60 * 60
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.revoked: Dict[str, float] = {}
+
+    def is_revoked(self, digest: str) -> bool:
+        expires_at = self.revoked.get(digest)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self.revoked[digest]
+            return False
+        return True
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the user id for a still-valid verified token, if cached"""
+        entry = self.entries.get(digest)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[digest]
+            return None
+        self.entries.move_to_end(digest)
+        return user_id
+
+    def put(self, digest: str, user_id: str, expires_at: float):
+        self.entries[digest] = (user_id, expires_at)
+        self.entries.move_to_end(digest)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def revoke(self, digest: str):
+        """Reject a token from now until it would have expired anyway"""
+        entry = self.entries.pop(digest, None)
+        now = time.time()
+        self.revoked[digest] = entry[1] if entry else now + DEFAULT_TOKEN_LIFETIME
+        # Expired revocations can never match a valid token again
+        for expired in [d for d, expires_at in self.revoked.items() if expires_at <= now]:
+            del self.revoked[expired]
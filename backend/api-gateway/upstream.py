@@ -0,0 +1,327 @@
+"""
+Upstream HTTP client registry for the API Gateway.
+
+One long-lived httpx.AsyncClient is kept per agent so that proxied calls reuse
+pooled keep-alive connections instead of paying a new TCP handshake each time.
+Clients are created on gateway startup and closed on shutdown. Each agent may
+list several replica URLs; every call is routed through its ReplicaPool and
+admitted by the agent's AdaptiveLimiter. Each call's timeout is also sent to
+the agent as a deadline header so it can stop working when the gateway stops
+waiting.
+"""
+
+import asyncio
+import os
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import anyio
+import httpx
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from shared.deadline import deadline_after, deadline_header
+from shared.metrics import UPSTREAM_REQUEST_DURATION
+from shared.tracing import span, trace_headers
+
+from concurrency import AdaptiveLimiter
+from replicas import Replica, ReplicaPool
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Default timeouts (seconds)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+# Also the gateway's default route timeout, so direct callers get the same budget
+UPSTREAM_DEFAULT_TIMEOUT = float(os.getenv("TIMEOUT_DEFAULT", "30"))
+
+
+# Response headers copied from the agent back to the client
+RELAYED_RESPONSE_HEADERS = (
+    "content-type",
+    "content-encoding",
+    "content-disposition",
+    "cache-control",
+)
+
+
+def relay_headers(headers: httpx.Headers) -> Dict[str, str]:
+    """Select the agent response headers that are safe to pass through"""
+    return {name: headers[name] for name in RELAYED_RESPONSE_HEADERS if name in headers}
+
+
+def relay_response(response: httpx.Response) -> Response:
+    """Pass an agent response through unchanged: same bytes, status and content headers"""
+    return Response(
+        content=response.content,
+        status_code=response.status_code,
+        headers=relay_headers(response.headers),
+    )
+
+
+class RelayedStreamingResponse(StreamingResponse):
+    """StreamingResponse that always runs on_close(None) once it is done.
+
+    Starlette skips background tasks when relaying the body fails, and a body
+    iterator that was never started is not finalized, so cleanup cannot rely
+    on either; on_close must be safe to call more than once.
+    """
+
+    def __init__(self, content, on_close: Callable[[Optional[bool]], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close(None)
+
+
+def build_timeout(seconds: Optional[float] = None) -> httpx.Timeout:
+    """Build an httpx timeout with a short connect phase and the given read budget"""
+    total = seconds if seconds is not None else UPSTREAM_DEFAULT_TIMEOUT
+    return httpx.Timeout(total, connect=min(UPSTREAM_CONNECT_TIMEOUT, total))
+
+
+def upstream_error(agent_name: str, error: httpx.TransportError) -> HTTPException:
+    """504 when the agent ran out of time, 502 for every other transport failure"""
+    if isinstance(error, httpx.TimeoutException) and not isinstance(error, httpx.ConnectTimeout):
+        return HTTPException(status_code=504, detail=f"Agent {agent_name} timed out")
+    return HTTPException(status_code=502, detail=f"Agent {agent_name} unavailable")
+
+
+class AgentClientRegistry:
+    """Holds one pooled AsyncClient per agent service"""
+
+    def __init__(self, services: Dict[str, List[str]], apps: Optional[Dict[str, Any]] = None, service: str = "api-gateway"):
+        self.services = services
+        # Name of the calling service, for the service label of upstream metrics
+        self.service = service
+        # Agents served in-process are called through their ASGI app instead of the network
+        self.apps = apps or {}
+        self.clients: Dict[str, httpx.AsyncClient] = {}
+        self.pools: Dict[str, ReplicaPool] = {
+            agent_name: ReplicaPool(agent_name, urls) for agent_name, urls in services.items()
+        }
+        self.limiters: Dict[str, AdaptiveLimiter] = {
+            agent_name: AdaptiveLimiter(agent_name, service) for agent_name in services
+        }
+
+    def _create_client(self, agent_name: str) -> httpx.AsyncClient:
+        if agent_name in self.apps:
+            return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.apps[agent_name]), timeout=build_timeout())
+        limits = httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        http2 = UPSTREAM_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️ h2 library not installed, falling back to HTTP/1.1")
+                http2 = False
+        return httpx.AsyncClient(limits=limits, timeout=build_timeout(), http2=http2)
+
+    async def start(self):
+        """Create a client for every configured agent"""
+        for agent_name in self.services:
+            if agent_name not in self.clients:
+                self.clients[agent_name] = self._create_client(agent_name)
+        logger.info(f"🔌 Upstream clients ready for {len(self.clients)} agents")
+
+    async def close(self):
+        """Close all pooled clients"""
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients.clear()
+        logger.info("🔌 Upstream clients closed")
+
+    def get(self, agent_name: str) -> httpx.AsyncClient:
+        """Return the pooled client for an agent"""
+        if agent_name not in self.services:
+            raise HTTPException(status_code=404, detail=f"Agent {agent_name} not found")
+        client = self.clients.get(agent_name)
+        if client is None:
+            # Lazily create clients for requests that arrive before startup completes
+            client = self.clients[agent_name] = self._create_client(agent_name)
+        return client
+
+    def pool(self, agent_name: str) -> ReplicaPool:
+        """Return the replica pool for an agent"""
+        if agent_name not in self.pools:
+            raise HTTPException(status_code=404, detail=f"Agent {agent_name} not found")
+        return self.pools[agent_name]
+
+    async def request(self, agent_name: str, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """Send a buffered request to the least-loaded healthy replica of an agent.
+
+        A request that could not even connect is retried once on another replica,
+        since nothing reached the first one.
+        """
+        pool = self.pool(agent_name)
+        client = self.get(agent_name)
+        limiter = self.limiters[agent_name]
+        # Time spent queueing for a slot counts against the call's budget
+        deadline = deadline_after(timeout if timeout is not None else UPSTREAM_DEFAULT_TIMEOUT)
+        await limiter.acquire()
+        try:
+            deadline_header(deadline)
+            replica = pool.choose()
+        except BaseException:
+            limiter.cancel()
+            raise
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span(f"upstream {agent_name}", {"http.method": method, "http.path": path}) as upstream_span:
+                response = await self._send(agent_name, pool, client, replica, method, path, deadline, **kwargs)
+                upstream_span.set_attribute("http.status_code", response.status_code)
+            status = str(response.status_code)
+            return response
+        except asyncio.CancelledError:
+            # Client disconnect, a cancelled batch sibling or our own deadline: says nothing about the agent
+            status = "cancelled"
+            limiter.cancel()
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            UPSTREAM_REQUEST_DURATION.labels(service=self.service, agent=agent_name, status=status).observe(elapsed)
+            if status != "cancelled":
+                limiter.release(elapsed * 1000, ok=status != "error" and int(status) < 500)
+
+    async def _send(self, agent_name: str, pool: ReplicaPool, client: httpx.AsyncClient, replica: Replica,
+                    method: str, path: str, deadline: float, **kwargs) -> httpx.Response:
+        headers = kwargs.pop("headers", None) or {}
+        for attempt in range(2):
+            hop_headers = {**headers, **deadline_header(deadline), **trace_headers()}
+            started = replica.begin()
+            ok = None  # stays None if the call is cancelled before the agent answers
+            try:
+                response = await client.request(
+                    method,
+                    f"{replica.url}{path}",
+                    timeout=build_timeout(deadline - time.monotonic()),
+                    headers=hop_headers,
+                    **kwargs
+                )
+                ok = True
+            except httpx.TransportError as e:
+                ok = False
+                error = e
+            finally:
+                replica.end(started, ok=ok)
+            if ok:
+                return response
+            logger.error(f"💥 Request to {agent_name} ({replica.url}) failed: {error}")
+            if attempt == 0 and isinstance(error, httpx.ConnectError) and len(pool.replicas) > 1:
+                try:
+                    replica = pool.choose(exclude=replica)
+                    continue
+                except HTTPException:
+                    pass
+            raise upstream_error(agent_name, error)
+
+    async def stream(self, agent_name: str, path: str, request: Request, timeout: Optional[float] = None,
+                     bounded: bool = True) -> StreamingResponse:
+        """Stream the incoming request body to an agent and stream its response back.
+
+        The body is forwarded chunk by chunk as it arrives, so neither the upload
+        nor the agent's response is ever held in gateway memory as a whole.
+        Pass bounded=False for long-lived streams such as server-sent events,
+        where timeout only limits each read and no deadline is sent. Such
+        streams mostly sit idle, so they take no concurrency slot: a few
+        watchers must not starve the agent's real calls.
+        """
+        pool = self.pool(agent_name)
+        client = self.get(agent_name)
+        limiter = self.limiters[agent_name] if bounded else None
+        deadline = deadline_after(timeout if timeout is not None else UPSTREAM_DEFAULT_TIMEOUT) if bounded else None
+        if limiter:
+            await limiter.acquire()
+        try:
+            headers = deadline_header(deadline) if bounded else {}
+            replica = pool.choose()
+        except BaseException:
+            if limiter:
+                limiter.cancel()
+            raise
+        headers["content-type"] = request.headers.get("content-type", "application/octet-stream")
+        if "content-length" in request.headers:
+            headers["content-length"] = request.headers["content-length"]
+        
+        started = replica.begin()
+        try:
+            upstream_request = client.build_request(
+                request.method,
+                f"{replica.url}{path}",
+                content=request.stream(),
+                headers=headers,
+                timeout=build_timeout(deadline - time.monotonic() if bounded else timeout),
+            )
+            # The span covers the upload and the wait for response headers
+            with span(f"upstream {agent_name}", {"http.method": request.method, "http.path": path, "replica": replica.url}) as upstream_span:
+                upstream_request.headers.update(trace_headers())
+                upstream = await client.send(upstream_request, stream=True)
+                upstream_span.set_attribute("http.status_code", upstream.status_code)
+        except httpx.TransportError as e:
+            replica.end(started, ok=False)
+            elapsed = time.perf_counter() - started
+            UPSTREAM_REQUEST_DURATION.labels(service=self.service, agent=agent_name, status="error").observe(elapsed)
+            if limiter:
+                limiter.release(elapsed * 1000, ok=False)
+            logger.error(f"💥 Streaming to {agent_name} ({replica.url}) failed: {e}")
+            raise upstream_error(agent_name, e)
+        except BaseException:
+            # The client went away mid-upload or the request was cancelled: nothing to judge the agent by
+            replica.end(started, ok=None)
+            if limiter:
+                limiter.cancel()
+            raise
+        # Time to response headers is the latency signal; the slot is held until the body is relayed
+        latency_ms = (time.perf_counter() - started) * 1000
+        UPSTREAM_REQUEST_DURATION.labels(service=self.service, agent=agent_name, status=str(upstream.status_code)).observe(latency_ms / 1000)
+        
+        finished = False
+        
+        async def finish(relayed: Optional[bool]):
+            # relayed is None when the client left before the whole body was sent
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            replica.end(started, ok=relayed)
+            if limiter:
+                limiter.release(latency_ms, ok=relayed is not False and upstream.status_code < 500)
+            # Close even while the request is being cancelled, or the connection is never returned
+            with anyio.CancelScope(shield=True):
+                await upstream.aclose()
+        
+        async def relay_body():
+            relayed = None
+            try:
+                async for chunk in upstream.aiter_raw():
+                    yield chunk
+                relayed = True
+            except httpx.TransportError as e:
+                relayed = False
+                logger.error(f"💥 Relaying {agent_name} ({replica.url}) response failed: {e}")
+                raise
+            finally:
+                await finish(relayed)
+        
+        return RelayedStreamingResponse(
+            relay_body(),
+            status_code=upstream.status_code,
+            headers=relay_headers(upstream.headers),
+            on_close=finish,
+        )
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark DOCX text extraction: python-docx DOM vs the streaming extractor.
+
+Builds synthetic resumes of increasing size (paragraphs plus a skills table)
+with python-docx, then reports the best-of-N time and peak Python memory of
+both extractors, and whether the streaming one recovered the table text.
+
+Usage:
+    python scripts/benchmark_docx.py [--sizes 100,1000,10000] [--repeat 5]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import docx
+
+# Add the backend directory to the path for shared module imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from shared.document_text import extract_docx
+
+
+def extract_docx_dom(file_content: bytes) -> str:
+    """The previous extractor: load the whole document and read paragraph.text"""
+    document = docx.Document(io.BytesIO(file_content))
+    return "".join(f"{paragraph.text}\n" for paragraph in document.paragraphs)
+
+
+def build_docx(paragraphs: int) -> bytes:
+    document = docx.Document()
+    for index in range(paragraphs):
+        document.add_paragraph(f"Paragraph {index}: built scalable services in Python, FastAPI and PostgreSQL.")
+        if index % 50 == 0:
+            table = document.add_table(rows=3, cols=2)
+            for row, (skill, level) in enumerate([("Python", "Expert"), ("SQL", "Advanced"), ("Docker", "Intermediate")]):
+                table.cell(row, 0).text = f"{skill} {index}"
+                table.cell(row, 1).text = level
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(extract, file_content: bytes, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = extract(file_content)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    extract(file_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return text, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated paragraph counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'size':>9} | {'dom ms':>8} {'dom peak':>9} | {'stream ms':>9} {'stream peak':>11} | {'speedup':>7} tables")
+    for paragraphs in (int(size) for size in args.sizes.split(",")):
+        file_content = build_docx(paragraphs)
+        _, dom_time, dom_peak = measure(extract_docx_dom, file_content, args.repeat)
+        text, stream_time, stream_peak = measure(extract_docx, file_content, args.repeat)
+        print(
+            f"{paragraphs:>10} {len(file_content) / 1024:>7.0f}KB | "
+            f"{dom_time * 1000:>8.1f} {dom_peak / 2**20:>7.1f}MB | "
+            f"{stream_time * 1000:>9.1f} {stream_peak / 2**20:>9.1f}MB | "
+            f"{dom_time / stream_time:>6.1f}x {'yes' if 'Python 0 | Expert' in text else 'NO'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Production launcher for the StudyMate backend services.
+
+Each service runs under uvicorn with several worker processes (one per CPU
+core by default), using uvloop and httptools when they are installed. Agents
+are started first and the gateway only once every agent answers /health, so
+the gateway never routes to a service that is still booting. On SIGTERM or
+Ctrl+C the services are stopped in reverse order and every worker drains its
+in-flight requests for up to LAUNCH_GRACEFUL_TIMEOUT seconds.
+
+Usage:
+    python scripts/launch.py                       # every service
+    python scripts/launch.py resume-analyzer api-gateway
+
+Agent worker counts come from LAUNCH_WORKERS, or <SERVICE>_WORKERS for a
+single service (e.g. RESUME_ANALYZER_WORKERS=2). Caps that each process
+enforces for itself, EXTRACTION_WORKERS (parse processes) and
+LLM_MAX_CONCURRENCY (provider calls), are meant for the whole service: a
+service started with several workers gets each cap divided by its worker
+count (at least 1 per worker), so N workers do not multiply them by N.
+
+The gateway always runs one
+worker: sign-out revocation, cache invalidation, circuit breakers and
+concurrency limits live in its process memory, and a second worker would
+keep accepting signed-out tokens and serving reads that another worker has
+invalidated. Scale the gateway by adding processes only once that state is
+shared.
+"""
+
+import importlib.util
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+except ImportError:
+    pass
+
+# Service name -> directory holding its main.py and the port it listens on.
+# Agents come before the gateway, which is started last.
+SERVICES = {
+    "profile-service": {"dir": os.path.join("agents", "profile-service"), "port": 8006},
+    "resume-analyzer": {"dir": os.path.join("agents", "resume-analyzer"), "port": 8003},
+    "course-service": {"dir": os.path.join("agents", "course-service"), "port": 8001},
+    "dsa-service": {"dir": os.path.join("agents", "dsa-service"), "port": 8007},
+    "api-gateway": {"dir": "api-gateway", "port": 8000},
+}
+
+LAUNCH_HOST = os.getenv("LAUNCH_HOST", "0.0.0.0")
+LAUNCH_WORKERS = int(os.getenv("LAUNCH_WORKERS", "0"))  # 0 = one per CPU core
+LAUNCH_GRACEFUL_TIMEOUT = int(os.getenv("LAUNCH_GRACEFUL_TIMEOUT", "30"))
+LAUNCH_READY_TIMEOUT = float(os.getenv("LAUNCH_READY_TIMEOUT", "60"))
+LAUNCH_BACKLOG = int(os.getenv("LAUNCH_BACKLOG", "2048"))
+
+# Services whose state is per process and must not be split across workers
+SINGLE_WORKER_SERVICES = ("api-gateway",)
+
+# Per-process caps (with the agents' defaults) that are divided among a service's workers
+SERVICE_WIDE_CAPS = {
+    "EXTRACTION_WORKERS": str(min(4, os.cpu_count() or 1)),
+    "LLM_MAX_CONCURRENCY": "32",
+}
+
+
+def worker_count(service: str) -> int:
+    """Workers for a service: <SERVICE>_WORKERS, else LAUNCH_WORKERS, else the CPU count"""
+    override = os.getenv(service.upper().replace("-", "_") + "_WORKERS")
+    if service in SINGLE_WORKER_SERVICES:
+        if override and int(override) > 1:
+            raise ValueError(f"{service} keeps per-process state and must run with 1 worker, not {override}")
+        return 1
+    if override:
+        return max(1, int(override))
+    if LAUNCH_WORKERS > 0:
+        return LAUNCH_WORKERS
+    return os.cpu_count() or 1
+
+
+def worker_env(service: str) -> Dict[str, str]:
+    """Environment for a service's workers, with SERVICE_WIDE_CAPS split between them"""
+    env = dict(os.environ)
+    workers = worker_count(service)
+    if workers > 1:
+        for name, default in SERVICE_WIDE_CAPS.items():
+            total = int(os.getenv(name, default))
+            if total > 0:  # 0 turns the feature off rather than capping it
+                env[name] = str(max(1, total // workers))
+    return env
+
+
+def event_loop() -> str:
+    """uvloop when installed (it does not support Windows), else the stdlib loop"""
+    if sys.platform != "win32" and importlib.util.find_spec("uvloop"):
+        return "uvloop"
+    print("⚠️ uvloop not installed, using the asyncio event loop")
+    return "asyncio"
+
+
+def http_protocol() -> str:
+    """httptools when installed, else the pure-Python h11 parser"""
+    if importlib.util.find_spec("httptools"):
+        return "httptools"
+    print("⚠️ httptools not installed, using h11")
+    return "h11"
+
+
+def uvicorn_command(service: str, loop: str, http: str) -> List[str]:
+    config = SERVICES[service]
+    return [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--app-dir", os.path.join(BACKEND_DIR, config["dir"]),
+        "--host", LAUNCH_HOST,
+        "--port", str(config["port"]),
+        "--workers", str(worker_count(service)),
+        "--loop", loop,
+        "--http", http,
+        "--backlog", str(LAUNCH_BACKLOG),
+        "--timeout-graceful-shutdown", str(LAUNCH_GRACEFUL_TIMEOUT),
+        "--no-access-log",
+    ]
+
+
+def wait_until_ready(service: str, process: subprocess.Popen) -> bool:
+    """Poll the service's /health until it answers 200, the process dies or the timeout passes"""
+    url = f"http://127.0.0.1:{SERVICES[service]['port']}/health"
+    deadline = time.monotonic() + LAUNCH_READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def stop_all(processes: Dict[str, subprocess.Popen]):
+    """SIGTERM services in reverse start order, so the gateway stops taking traffic first"""
+    for service, process in reversed(list(processes.items())):
+        if process.poll() is None:
+            print(f"🛑 Draining {service}...")
+            process.terminate()
+            try:
+                process.wait(timeout=LAUNCH_GRACEFUL_TIMEOUT + 5)
+            except subprocess.TimeoutExpired:
+                print(f"🔨 {service} did not drain in time, killing it")
+                process.kill()
+                process.wait()
+
+
+def main(argv: List[str]) -> int:
+    services = argv or list(SERVICES)
+    if not argv and os.getenv("GATEWAY_MODE", "microservices").lower() == "inprocess":
+        # The gateway serves the agents itself
+        services = ["api-gateway"]
+    unknown = [service for service in services if service not in SERVICES]
+    if unknown:
+        print(f"❌ Unknown services: {', '.join(unknown)} (choose from {', '.join(SERVICES)})")
+        return 2
+    # Keep the requested services in dependency order
+    services = [service for service in SERVICES if service in services]
+
+    try:
+        for service in services:
+            worker_count(service)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+
+    loop, http = event_loop(), http_protocol()
+    processes: Dict[str, subprocess.Popen] = {}
+
+    def handle_signal(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    try:
+        for service in services:
+            port = SERVICES[service]["port"]
+            print(f"📡 Starting {service} on port {port} with {worker_count(service)} workers ({loop}/{http})...")
+            processes[service] = subprocess.Popen(uvicorn_command(service, loop, http), cwd=BACKEND_DIR, env=worker_env(service))
+            if not wait_until_ready(service, processes[service]):
+                print(f"❌ {service} did not become healthy within {LAUNCH_READY_TIMEOUT:.0f}s")
+                stop_all(processes)
+                return 1
+            print(f"✅ {service} is ready")
+
+        print("🎉 All services ready")
+        # Exit if any service dies, so a supervisor can restart the whole set
+        while all(process.poll() is None for process in processes.values()):
+            time.sleep(1)
+        failed = [service for service, process in processes.items() if process.poll() is not None]
+        print(f"💥 {', '.join(failed)} exited unexpectedly")
+        stop_all(processes)
+        return 1
+    except KeyboardInterrupt:
+        stop_all(processes)
+        print("👋 All services stopped")
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
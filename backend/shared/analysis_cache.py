@@ -0,0 +1,153 @@
+"""
+Content-addressed cache of resume analyses.
+
+An analysis is keyed by the SHA-256 of the uploaded file together with the
+normalized job role and job description and a version string, so the same
+resume submitted again for the same role is answered without parsing or an
+LLM call, and bumping the version (whenever the prompt changes) retires every
+old entry. Entries live in an in-process LRU and, behind it, in a persistent
+store shared by all processes: local disk or a service-provided table,
+selected with ANALYSIS_CACHE_BACKEND=memory|disk|postgres|none.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_BACKEND = os.getenv("ANALYSIS_CACHE_BACKEND", "memory").lower()
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", ".cache", "analyses"))
+
+
+def normalize_text(value: str) -> str:
+    """Case-fold and collapse whitespace, so trivially different inputs share a key"""
+    return " ".join((value or "").split()).casefold()
+
+
+def analysis_cache_key(file_content: bytes, job_role: str, job_description: str, version: str) -> str:
+    """Key for one analysis: file hash, normalized role and JD, and the prompt version"""
+    digest = hashlib.sha256()
+    for part in (
+        version.encode(),
+        hashlib.sha256(file_content).digest(),
+        normalize_text(job_role).encode(),
+        normalize_text(job_description).encode(),
+    ):
+        # Length-prefix each part so no two different inputs concatenate to the same bytes
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class AnalysisCacheStore:
+    """Persistent tier; the default keeps nothing"""
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        pass
+
+
+class DiskAnalysisStore(AnalysisCacheStore):
+    """One JSON file per entry under ANALYSIS_CACHE_DIR"""
+
+    def __init__(self, directory: str = ANALYSIS_CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        if entry["expires_at"] <= time.time():
+            os.remove(self._path(key))
+            return None
+        return entry["value"]
+
+    def _write(self, key: str, value: Dict[str, Any], ttl: float):
+        # Write then rename, so concurrent readers never see a partial file
+        temporary = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": time.time() + ttl, "value": value}, f)
+        os.replace(temporary, self._path(key))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: float):
+        await asyncio.to_thread(self._write, key, value, ttl)
+
+
+class AnalysisCache:
+    """In-process LRU in front of a persistent store, both with the same TTL"""
+
+    def __init__(self, store: Optional[AnalysisCacheStore] = None,
+                 max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES, ttl: float = ANALYSIS_CACHE_TTL):
+        self.store = store or AnalysisCacheStore()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                return value
+            del self.entries[key]
+        try:
+            value = await self.store.get(key)
+        except Exception as e:
+            # A broken persistent tier only costs a cache miss
+            logger.warning(f"⚠️ Analysis cache read failed: {e}")
+            return None
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value)
+        try:
+            await self.store.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Analysis cache write failed: {e}")
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def create_analysis_cache(postgres_store: Optional[AnalysisCacheStore] = None) -> Optional[AnalysisCache]:
+    """Build the cache selected by ANALYSIS_CACHE_BACKEND, or None when disabled.
+
+    postgres_store is the service's database-backed store, used for
+    ANALYSIS_CACHE_BACKEND=postgres.
+    """
+    if ANALYSIS_CACHE_BACKEND == "none":
+        return None
+    store = None
+    if ANALYSIS_CACHE_BACKEND == "disk":
+        store = DiskAnalysisStore()
+    elif ANALYSIS_CACHE_BACKEND == "postgres":
+        if postgres_store is None:
+            logger.warning("⚠️ No Postgres analysis cache store available, caching in memory only")
+        store = postgres_store
+    logger.info(f"✅ Analysis cache enabled ({ANALYSIS_CACHE_BACKEND})")
+    return AnalysisCache(store)
@@ -11,6 +11,9 @@ from datetime import datetime
 import json
 import logging
 
+from shared.deadline import time_left
+from shared.metrics import timed_acquire
+
 logger = logging.getLogger(__name__)
 
 # Supabase configuration
@@ -18,37 +21,59 @@ SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL", "postgresql://postgres:your_passw
 SUPABASE_URL = os.getenv("SUPABASE_URL", "https://jwmsgrodliegekbrhvgt.supabase.co")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 
+# Upper bound for one query; requests with a deadline get whatever is left of it instead
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "10"))
+
+def db_timeout() -> float:
+    """Timeout for the next query, bounded by the current request's deadline"""
+    return time_left(DB_COMMAND_TIMEOUT)
+
 class SupabaseManager:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self.users = 0
         
     async def connect(self):
-        """Create database connection pool"""
+        """Create database connection pool, or share the one already open"""
+        if self.pool is not None:
+            # Agents mounted in one process (gateway in-process mode) share a single pool
+            self.users += 1
+            return
         try:
             self.pool = await asyncpg.create_pool(
                 SUPABASE_DB_URL,
                 min_size=1,
                 max_size=10,
-                command_timeout=60
+                command_timeout=DB_COMMAND_TIMEOUT
             )
+            self.users = 1
             logger.info("Connected to Supabase PostgreSQL successfully!")
         except Exception as e:
             logger.error(f"Failed to connect to Supabase: {e}")
             raise e
     
     async def disconnect(self):
-        """Close database connection pool"""
+        """Close database connection pool once its last user disconnects"""
         if self.pool:
+            self.users -= 1
+            if self.users > 0:
+                return
             await self.pool.close()
+            self.pool = None
             logger.info("Disconnected from Supabase PostgreSQL")
     
+    def acquire(self):
+        """Check out a pooled connection, waiting no longer than the request deadline allows"""
+        return timed_acquire(self.pool, timeout=time_left(DB_ACQUIRE_TIMEOUT))
+    
     async def execute_query(self, query: str, *args) -> List[Dict]:
         """Execute a SELECT query and return results"""
         if not self.pool:
             raise Exception("Database not connected")
         
-        async with self.pool.acquire() as connection:
-            rows = await connection.fetch(query, *args)
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query, *args, timeout=db_timeout())
             return [dict(row) for row in rows]
     
     async def execute_command(self, command: str, *args) -> str:
@@ -56,8 +81,8 @@ class SupabaseManager:
         if not self.pool:
             raise Exception("Database not connected")
         
-        async with self.pool.acquire() as connection:
-            result = await connection.execute(command, *args)
+        async with self.acquire() as connection:
+            result = await connection.execute(command, *args, timeout=db_timeout())
             return result
     
     async def fetch_one(self, query: str, *args) -> Optional[Dict]:
@@ -65,8 +90,8 @@ class SupabaseManager:
         if not self.pool:
             raise Exception("Database not connected")
         
-        async with self.pool.acquire() as connection:
-            row = await connection.fetchrow(query, *args)
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, *args, timeout=db_timeout())
             return dict(row) if row else None
 
 # Global database manager instance
@@ -91,7 +116,7 @@ async def create_user_profile(user_id: str, profile_data: Dict) -> Dict:
         RETURNING *
     """
     
-    async with db_manager.pool.acquire() as connection:
+    async with db_manager.acquire() as connection:
         row = await connection.fetchrow(
             query,
             user_id,
@@ -102,7 +127,8 @@ async def create_user_profile(user_id: str, profile_data: Dict) -> Dict:
             profile_data.get('linkedin_url'),
             profile_data.get('github_url'),
             profile_data.get('portfolio_url'),
-            profile_data.get('professional_summary')
+            profile_data.get('professional_summary'),
+            timeout=db_timeout()
         )
         return dict(row)
 
@@ -117,7 +143,7 @@ async def update_user_profile(user_id: str, profile_data: Dict) -> Dict:
         RETURNING *
     """
     
-    async with db_manager.pool.acquire() as connection:
+    async with db_manager.acquire() as connection:
         row = await connection.fetchrow(
             query,
             user_id,
@@ -128,7 +154,8 @@ async def update_user_profile(user_id: str, profile_data: Dict) -> Dict:
             profile_data.get('linkedin_url'),
             profile_data.get('github_url'),
             profile_data.get('portfolio_url'),
-            profile_data.get('professional_summary')
+            profile_data.get('professional_summary'),
+            timeout=db_timeout()
         )
         return dict(row) if row else None
 
@@ -143,7 +170,7 @@ async def save_resume_analysis(user_id: str, resume_data: Dict) -> str:
         RETURNING id
     """
     
-    async with db_manager.pool.acquire() as connection:
+    async with db_manager.acquire() as connection:
         row = await connection.fetchrow(
             query,
             user_id,
@@ -154,7 +181,31 @@ async def save_resume_analysis(user_id: str, resume_data: Dict) -> str:
             json.dumps(resume_data.get('ai_analysis', {})),
             resume_data.get('skill_gaps', []),
             resume_data.get('recommendations', []),
-            'completed'
+            'completed',
+            timeout=db_timeout()
+        )
+        return str(row['id'])
+
+async def save_resume_extraction(user_id: str, extracted_data: Dict, confidence_score: float,
+                                 resume_id: Optional[str] = None) -> str:
+    """Save an AI profile extraction awaiting the user's review; confidence_score is a fraction (0-1)"""
+    query = """
+        INSERT INTO resume_extractions (
+            user_id, resume_id, extracted_data, status, extraction_type, confidence_score
+        ) VALUES ($1, $2, $3, $4, $5, $6)
+        RETURNING id
+    """
+    
+    async with db_manager.acquire() as connection:
+        row = await connection.fetchrow(
+            query,
+            user_id,
+            resume_id,
+            json.dumps(extracted_data),
+            'completed',
+            'groq_ai',
+            round(confidence_score, 2),
+            timeout=db_timeout()
         )
         return str(row['id'])
 
@@ -167,6 +218,101 @@ async def get_user_resumes(user_id: str) -> List[Dict]:
     """
     return await db_manager.execute_query(query, user_id)
 
+# Resume analysis job operations
+async def create_analysis_job(job: Dict, owner: str) -> None:
+    """Persist a newly queued resume analysis job, owned by the process running it"""
+    query = """
+        INSERT INTO resume_analysis_jobs (id, user_id, filename, job_role, status, owner, heartbeat_at)
+        VALUES ($1, $2, $3, $4, $5, $6, NOW())
+    """
+    metadata = job.get('metadata', {})
+    await db_manager.execute_command(
+        query,
+        job['job_id'],
+        metadata.get('user_id'),
+        metadata.get('filename'),
+        metadata.get('job_role'),
+        job['status'],
+        owner
+    )
+
+async def update_analysis_job(job: Dict) -> None:
+    """Persist the latest status, result or error of a resume analysis job"""
+    query = """
+        UPDATE resume_analysis_jobs
+        SET status = $2, result = $3, error = $4, updated_at = NOW(), heartbeat_at = NOW(),
+            completed_at = CASE WHEN $2 IN ('completed', 'failed') THEN NOW() ELSE completed_at END
+        WHERE id = $1
+    """
+    await db_manager.execute_command(
+        query,
+        job['job_id'],
+        job['status'],
+        json.dumps(job['result']) if job.get('result') is not None else None,
+        job.get('error')
+    )
+
+async def get_analysis_job(job_id: str) -> Optional[Dict]:
+    """Get a resume analysis job by ID"""
+    query = "SELECT * FROM resume_analysis_jobs WHERE id = $1"
+    row = await db_manager.fetch_one(query, job_id)
+    if not row:
+        return None
+    return {
+        "job_id": str(row['id']),
+        "status": row['status'],
+        "result": json.loads(row['result']) if row['result'] else None,
+        "error": row['error'],
+        "metadata": {
+            "user_id": row['user_id'],
+            "filename": row['filename'],
+            "job_role": row['job_role']
+        },
+        "created_at": row['created_at'].isoformat(),
+        "updated_at": row['updated_at'].isoformat()
+    }
+
+async def heartbeat_analysis_jobs(owner: str) -> str:
+    """Renew the heartbeat of every unfinished job owned by this process"""
+    command = """
+        UPDATE resume_analysis_jobs
+        SET heartbeat_at = NOW()
+        WHERE owner = $1 AND status IN ('queued', 'processing')
+    """
+    return await db_manager.execute_command(command, owner)
+
+async def fail_interrupted_analysis_jobs(stale_after_seconds: float) -> str:
+    """Mark unfinished jobs as failed once their owner has not renewed them for stale_after_seconds"""
+    command = """
+        UPDATE resume_analysis_jobs
+        SET status = 'failed', error = 'Interrupted by service restart',
+            updated_at = NOW(), completed_at = NOW()
+        WHERE status IN ('queued', 'processing')
+          AND heartbeat_at < NOW() - make_interval(secs => $1)
+    """
+    return await db_manager.execute_command(command, float(stale_after_seconds))
+
+# Resume analysis cache operations
+async def get_cached_analysis(cache_key: str) -> Optional[Dict]:
+    """Get an unexpired cached resume analysis by its content key"""
+    query = "SELECT value FROM resume_analysis_cache WHERE cache_key = $1 AND expires_at > NOW()"
+    row = await db_manager.fetch_one(query, cache_key)
+    return json.loads(row['value']) if row else None
+
+async def save_cached_analysis(cache_key: str, value: Dict, ttl_seconds: float) -> None:
+    """Store a resume analysis under its content key, replacing any older entry"""
+    command = """
+        INSERT INTO resume_analysis_cache (cache_key, value, expires_at)
+        VALUES ($1, $2, NOW() + make_interval(secs => $3))
+        ON CONFLICT (cache_key) DO UPDATE
+        SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at, created_at = NOW()
+    """
+    await db_manager.execute_command(command, cache_key, json.dumps(value), float(ttl_seconds))
+
+async def purge_expired_analysis_cache() -> str:
+    """Delete expired cached resume analyses"""
+    return await db_manager.execute_command("DELETE FROM resume_analysis_cache WHERE expires_at <= NOW()")
+
 # Education operations
 async def save_user_education(user_id: str, education_data: List[Dict]) -> bool:
     """Save user education data"""
@@ -349,8 +495,8 @@ async def health_check() -> Dict[str, Any]:
         if not db_manager.pool:
             return {"status": "unhealthy", "error": "No connection pool"}
         
-        async with db_manager.pool.acquire() as connection:
-            await connection.fetchval("SELECT 1")
+        async with db_manager.acquire() as connection:
+            await connection.fetchval("SELECT 1", timeout=db_timeout())
         
         return {
             "status": "healthy",
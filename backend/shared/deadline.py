@@ -0,0 +1,147 @@
+"""
+Request deadlines shared by the gateway and the agents.
+
+The gateway gives every upstream call a time budget and sends what is left of
+it in the X-Request-Timeout-Ms header. DeadlineMiddleware turns that header
+into a deadline for the current request, held in a context variable, so DB
+queries and LLM calls can size their own timeouts from it and the request is
+abandoned with 504 once the caller has stopped waiting. The budget travels as
+a relative duration, so clocks on different hosts do not need to agree.
+"""
+
+import asyncio
+import json
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, TypeVar
+
+from fastapi import HTTPException
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+T = TypeVar("T")
+
+# Absolute deadline of the current request on the time.monotonic() clock
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline exceeded")
+
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def set_deadline(deadline: Optional[float]):
+    return _deadline.set(deadline)
+
+
+def deadline_after(seconds: Optional[float]) -> Optional[float]:
+    """Deadline `seconds` from now, never later than the current request's own"""
+    current = _deadline.get()
+    if seconds is None:
+        return current
+    deadline = time.monotonic() + seconds
+    return deadline if current is None else min(deadline, current)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the deadline, capped at default; default when there is none"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default
+    left = deadline - time.monotonic()
+    return left if default is None else min(left, default)
+
+
+def check_deadline():
+    """Raise 504 if the current request's deadline has passed"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+
+def time_left(default: float) -> float:
+    """Timeout for the next blocking call: the remaining budget capped at default.
+
+    Raises 504 instead of returning a non-positive timeout.
+    """
+    left = remaining(default)
+    if left <= 0:
+        raise DeadlineExceeded()
+    return left
+
+
+async def with_deadline(awaitable: Awaitable[T], default_timeout: float) -> T:
+    """Await with a timeout derived from the deadline, failing with 504 when it runs out"""
+    try:
+        return await asyncio.wait_for(awaitable, time_left(default_timeout))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
+
+
+def deadline_header(deadline: float) -> Dict[str, str]:
+    """Header carrying what is left of a deadline to the next hop"""
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return {DEADLINE_HEADER: str(int(left * 1000))}
+
+
+class DeadlineMiddleware:
+    """Apply the caller's X-Request-Timeout-Ms budget to the whole request.
+
+    Requests without the header run unbounded, as before.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = DEADLINE_HEADER.lower().encode()
+        raw = next((value for name, value in scope["headers"] if name == header), None)
+        try:
+            budget = int(raw) / 1000 if raw is not None else None
+        except ValueError:
+            budget = None
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+        if budget <= 0:
+            await self._timeout(send)
+            return
+
+        response_started = False
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        token = set_deadline(time.monotonic() + budget)
+        try:
+            await asyncio.wait_for(self.app(scope, receive, tracking_send), budget)
+        except asyncio.TimeoutError:
+            # The caller has given up; stop the work and answer if we still can
+            if not response_started:
+                await self._timeout(send)
+        finally:
+            _deadline.reset(token)
+
+    async def _timeout(self, send):
+        body = json.dumps({"detail": "Request deadline exceeded"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
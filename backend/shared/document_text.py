@@ -0,0 +1,273 @@
+"""
+Text extraction from uploaded PDF and DOCX resumes.
+
+Parsing is CPU-bound, so it runs in a process pool instead of on the event
+loop: a service keeps answering other requests while a large upload is being
+parsed, and parses of concurrent uploads use several cores. After the first
+page (which tells the page count) a PDF's remaining pages are split evenly
+into ranges of at most PDF_PAGES_PER_TASK pages, parsed by different
+workers. Set EXTRACTION_WORKERS=0 to parse in a thread instead, for hosts
+where extra processes are unwelcome.
+
+Only as much text as the LLM prompts can use is extracted: parsing stops
+after PDF_MAX_PAGES pages or EXTRACTION_MAX_CHARS characters. Parsed PDF
+pages are cached by the file's hash, so a re-upload, or the profile service
+and the analyzer parsing the same file in one process (gateway in-process
+mode), reuses the pages already parsed.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import math
+import os
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import PyPDF2
+from fastapi import HTTPException
+
+from shared.deadline import DeadlineExceeded, remaining, with_deadline
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "30"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+# Budgets: parsing stops once this many pages / characters are collected (0 = no limit)
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "10"))
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", "20000"))
+PDF_PAGE_CACHE_DOCUMENTS = int(os.getenv("PDF_PAGE_CACHE_DOCUMENTS", "256"))
+
+PDF_CONTENT_TYPE = "application/pdf"
+DOCX_CONTENT_TYPES = (
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/msword",
+)
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_BODY, _P, _R, _T, _TAB, _TC, _TR = (f"{_W}{name}" for name in ("body", "p", "r", "t", "tab", "tc", "tr"))
+_BREAKS = (f"{_W}br", f"{_W}cr")
+_BLOCKS = (_P, f"{_W}tbl")
+_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def extract_pdf_pages(file_content: bytes, pages: List[int], max_chars: int = 0) -> Tuple[int, Dict[int, str]]:
+    """The document's page count and the text of the given pages; runs in a worker.
+
+    Stops early once max_chars characters (0 = no limit) have been extracted.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    page_count = len(reader.pages)
+    texts: Dict[int, str] = {}
+    collected = 0
+    for index in pages:
+        if index >= page_count:
+            break
+        texts[index] = reader.pages[index].extract_text()
+        collected += len(texts[index]) + 1
+        if max_chars and collected >= max_chars:
+            break
+    return page_count, texts
+
+
+def extract_docx(file_content: bytes, max_chars: int = 0) -> str:
+    """Text of the document body in order, one paragraph or table row per line; runs in a worker.
+
+    word/document.xml is parsed incrementally straight from the zip and every
+    finished block is dropped from the tree, so memory stays bounded by the
+    largest paragraph or table rather than the document. Table rows become
+    one line with their cells separated by " | ". Parsing stops once
+    max_chars characters (0 = no limit) have been collected.
+    """
+    out = io.StringIO()
+    paragraphs: List[List[str]] = []  # text runs of open paragraphs (text boxes nest them)
+    cells: List[List[str]] = []  # paragraphs of open table cells
+    rows: List[List[str]] = []  # cell texts of open table rows
+    skipping = 0  # depth inside mc:Fallback, which repeats the content of mc:Choice
+    runs = 0  # depth inside w:r; tabs elsewhere (e.g. w:pPr/w:tabs) are tab stops, not text
+    body = None
+
+    def emit(text: str):
+        if cells:
+            cells[-1].append(text)
+        else:
+            out.write(text)
+            out.write("\n")
+
+    with zipfile.ZipFile(io.BytesIO(file_content)) as archive, archive.open("word/document.xml") as xml:
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            if max_chars and out.tell() >= max_chars:
+                break
+            tag = element.tag
+            if event == "start":
+                if tag == _FALLBACK or skipping:
+                    skipping += 1
+                elif tag == _P:
+                    paragraphs.append([])
+                elif tag == _R:
+                    runs += 1
+                elif tag == _TC:
+                    cells.append([])
+                elif tag == _TR:
+                    rows.append([])
+                elif tag == _BODY:
+                    body = element
+                continue
+
+            if skipping:
+                skipping -= 1
+            elif tag == _T and paragraphs:
+                paragraphs[-1].append(element.text or "")
+            elif tag == _R:
+                runs -= 1
+            elif tag == _TAB and runs and paragraphs:
+                paragraphs[-1].append("\t")
+            elif tag in _BREAKS and runs and paragraphs:
+                paragraphs[-1].append("\n")
+            elif tag == _P:
+                emit("".join(paragraphs.pop()))
+            elif tag == _TC:
+                rows[-1].append(" ".join(text for text in cells.pop() if text))
+            elif tag == _TR:
+                emit(" | ".join(rows.pop()))
+
+            if body is not None and tag in _BLOCKS and not paragraphs and not cells:
+                # A top-level paragraph or table is finished; nothing refers to it any more
+                body.clear()
+    text = out.getvalue()
+    return text[:max_chars] if max_chars else text
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+        logger.info(f"🧵 Text extraction pool started with {EXTRACTION_WORKERS} processes")
+    return _pool
+
+
+def shutdown_extraction_pool():
+    """Stop the worker processes; the pool is recreated on next use"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def _run(func: Callable, *args):
+    if EXTRACTION_WORKERS <= 0:
+        return await asyncio.to_thread(func, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(_get_pool(), func, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start afresh for the next request
+        shutdown_extraction_pool()
+        raise
+
+
+class PdfPageCache:
+    """Extracted page texts per document, keyed by the SHA-256 of the file; least recently used dropped first"""
+
+    def __init__(self, max_documents: int = PDF_PAGE_CACHE_DOCUMENTS):
+        self.max_documents = max_documents
+        self.documents: "OrderedDict[str, Tuple[int, Dict[int, str]]]" = OrderedDict()
+
+    def get(self, digest: str) -> Tuple[Optional[int], Dict[int, str]]:
+        """(page count or None if unknown, texts of the pages extracted so far)"""
+        if digest not in self.documents:
+            return None, {}
+        self.documents.move_to_end(digest)
+        page_count, pages = self.documents[digest]
+        return page_count, dict(pages)
+
+    def update(self, digest: str, page_count: int, pages: Dict[int, str]):
+        if self.max_documents <= 0:
+            return
+        _, cached = self.documents.get(digest, (page_count, {}))
+        cached.update(pages)
+        self.documents[digest] = (page_count, cached)
+        self.documents.move_to_end(digest)
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+
+
+pdf_page_cache = PdfPageCache()
+
+
+def _assemble(pages: Dict[int, str], page_limit: int, max_chars: int) -> Tuple[str, bool]:
+    """Join leading pages in order; True when the budget is met or a page is still missing"""
+    parts: List[str] = []
+    collected = 0
+    for index in range(page_limit):
+        if index not in pages:
+            return "".join(parts), False
+        parts.append(f"{pages[index]}\n")
+        collected += len(parts[-1])
+        if max_chars and collected >= max_chars:
+            return "".join(parts)[:max_chars], True
+    return "".join(parts), True
+
+
+async def _extract_pdf(file_content: bytes, max_pages: int = PDF_MAX_PAGES, max_chars: int = EXTRACTION_MAX_CHARS) -> str:
+    digest = hashlib.sha256(file_content).hexdigest()
+    page_count, pages = pdf_page_cache.get(digest)
+
+    def page_limit() -> int:
+        known = page_count if page_count is not None else 1
+        return min(known, max_pages) if max_pages else known
+
+    if page_count is None:
+        # Parse just the first page to learn the page count, so the rest can be spread out
+        page_count, extracted = await _run(extract_pdf_pages, file_content, [0], max_chars)
+        pages.update(extracted)
+        pdf_page_cache.update(digest, page_count, extracted)
+    text, done = _assemble(pages, page_limit(), max_chars)
+    if done:
+        return text
+
+    # Spread the remaining pages within the budget evenly over the pool's workers
+    missing = [index for index in range(page_limit()) if index not in pages]
+    per_task = min(PDF_PAGES_PER_TASK, math.ceil(len(missing) / max(1, EXTRACTION_WORKERS)))
+    chunks = [missing[start:start + per_task] for start in range(0, len(missing), per_task)]
+    needed = max(0, max_chars - len(text)) if max_chars else 0
+    for _, extracted in await asyncio.gather(*(_run(extract_pdf_pages, file_content, chunk, needed) for chunk in chunks)):
+        pages.update(extracted)
+        pdf_page_cache.update(digest, page_count, extracted)
+    text, _ = _assemble(pages, page_limit(), max_chars)
+    return text
+
+
+async def extract_text(file_content: bytes, content_type: str) -> str:
+    """Extract the text of a PDF or DOCX upload; empty when the file cannot be parsed.
+
+    Raises 400 for other content types.
+    """
+    if content_type == PDF_CONTENT_TYPE:
+        extract = _extract_pdf(file_content)
+    elif content_type in DOCX_CONTENT_TYPES:
+        extract = _run(extract_docx, file_content, EXTRACTION_MAX_CHARS)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload PDF or DOCX.")
+    request_left = remaining()
+    try:
+        return await with_deadline(extract, EXTRACTION_TIMEOUT)
+    except DeadlineExceeded:
+        if request_left is not None and request_left <= EXTRACTION_TIMEOUT:
+            # The caller's deadline ran out, not the parse budget
+            raise
+        logger.error(f"⏱️ Extracting {content_type} text took longer than {EXTRACTION_TIMEOUT:.0f}s")
+        raise HTTPException(status_code=422, detail="Resume took too long to parse. Please upload a simpler PDF or DOCX.")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting {content_type} text: {e}")
+        return ""
@@ -0,0 +1,180 @@
+"""
+Bounded background job queue for long-running agent work.
+
+Submitting a job returns immediately with a job id while a fixed pool of
+worker tasks processes the queue. Job state is kept in memory for fast polling
+and server-sent events, and is mirrored to a persistent store so finished
+results can still be fetched after a restart.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+TERMINAL_STATES = (COMPLETED, FAILED)
+
+
+class Job:
+    def __init__(self, job_id: str, payload: Dict[str, Any], metadata: Dict[str, Any]):
+        self.id = job_id
+        self.payload = payload
+        self.metadata = metadata
+        self.status = QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.updated_at = self.created_at
+        self.changed = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "metadata": self.metadata,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class JobStore:
+    """Persistence hooks for jobs; the default keeps nothing beyond memory"""
+
+    async def create(self, job: Dict[str, Any]):
+        pass
+
+    async def update(self, job: Dict[str, Any]):
+        pass
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class JobQueue:
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        max_pending: int = 100,
+        store: Optional[JobStore] = None,
+        retention: float = 300,
+    ):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.retention = retention
+        self.queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=max_pending)
+        self.store = store or JobStore()
+        self.jobs: Dict[str, Job] = {}
+        self._tasks = []
+
+    async def start(self):
+        for index in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(index)))
+        logger.info(f"👷 {self.name} job queue started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, payload: Dict[str, Any], metadata: Dict[str, Any]) -> Job:
+        """Queue a job, or reject with 503 when the queue is full"""
+        if self.queue.full():
+            raise self._queue_full()
+        job = Job(str(uuid.uuid4()), payload, metadata)
+        self.jobs[job.id] = job
+        # Persist before queueing so a worker's first update never races the insert
+        await self._persist(job, create=True)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await self._update(job, FAILED, error="Queue was full")
+            raise self._queue_full()
+        return job
+
+    def _queue_full(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail=f"{self.name} queue is full, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a job, falling back to the persistent store"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        try:
+            return await self.store.get(job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load job {job_id}: {e}")
+            return None
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> bool:
+        """Wait until an in-memory job changes state; False on timeout"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Not owned by this process; callers re-read the store after the wait
+            await asyncio.sleep(timeout)
+            return False
+        changed = job.changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._update(job, PROCESSING)
+                result = await self.handler(job.payload)
+                await self._update(job, COMPLETED, result=result)
+            except asyncio.CancelledError:
+                await self._update(job, FAILED, error="Worker stopped before the job finished")
+                raise
+            except HTTPException as e:
+                await self._update(job, FAILED, error=str(e.detail))
+            except Exception as e:
+                logger.error(f"💥 {self.name} job {job.id} failed: {e}")
+                await self._update(job, FAILED, error=str(e))
+            finally:
+                job.payload = {}
+                self.queue.task_done()
+
+    async def _update(self, job: Job, status: str, result: Dict[str, Any] = None, error: str = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.updated_at = datetime.now()
+        # Wake everyone waiting on the previous event, then arm a fresh one
+        changed, job.changed = job.changed, asyncio.Event()
+        changed.set()
+        await self._persist(job)
+        if status in TERMINAL_STATES:
+            # Finished jobs are served from the store once they leave memory
+            asyncio.get_running_loop().call_later(self.retention, self.jobs.pop, job.id, None)
+
+    async def _persist(self, job: Job, create: bool = False):
+        try:
+            if create:
+                await self.store.create(job.to_dict())
+            else:
+                await self.store.update(job.to_dict())
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to persist job {job.id}: {e}")
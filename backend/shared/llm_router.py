@@ -0,0 +1,164 @@
+"""
+Hedged routing across LLM providers.
+
+Providers are ranked by an EWMA of their recent latency, inflated by their
+recent error rate, and the best one is called first. If it has not answered
+within its own p95 latency (the hedge delay), or fails sooner, the next
+provider is started alongside it; the first call to return a valid result
+wins and the others are cancelled. Worst-case latency is then roughly the
+primary's p95 plus the backup's latency instead of a full timeout plus the
+backup's latency.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from shared.deadline import check_deadline
+from shared.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+LLM_HEDGE_MAX_DELAY = float(os.getenv("LLM_HEDGE_MAX_DELAY", "20"))
+# Hedge delay and assumed latency for a provider with no history yet
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "8"))
+
+LATENCY_ALPHA = 0.2
+ERROR_ALPHA = 0.1
+LATENCY_WINDOW = 100
+
+LLM_HEDGED = Counter(
+    "llm_hedged_requests_total",
+    "Backup LLM calls started because the current provider was slow or failed",
+    ("provider", "reason"),
+)
+LLM_ROUTER_WINS = Counter("llm_router_wins_total", "Routed LLM requests answered by each provider", ("provider",))
+
+
+class AllProvidersFailed(Exception):
+    def __init__(self, errors: Dict[str, BaseException]):
+        self.errors = errors
+        super().__init__("; ".join(f"{name}: {error}" for name, error in errors.items()) or "No LLM provider available")
+
+
+class ProviderStats:
+    """Recent latency and error rate of one provider"""
+
+    def __init__(self):
+        self.latency = LLM_HEDGE_DEFAULT_DELAY
+        self.error_rate = 0.0
+        self.samples: "deque[float]" = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, seconds: float, ok: bool):
+        self.error_rate += ERROR_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            # Failures are often fast rejections and would flatter the latency estimate
+            self.latency = seconds if not self.samples else self.latency + LATENCY_ALPHA * (seconds - self.latency)
+            self.samples.append(seconds)
+
+    def score(self) -> float:
+        """Expected seconds to a good answer; lower is better"""
+        return self.latency / max(0.05, 1.0 - self.error_rate)
+
+    def hedge_delay(self) -> float:
+        if not self.samples:
+            return LLM_HEDGE_DEFAULT_DELAY
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, math.ceil(len(ordered) * LLM_HEDGE_PERCENTILE / 100) - 1)
+        return min(LLM_HEDGE_MAX_DELAY, max(LLM_HEDGE_MIN_DELAY, ordered[index]))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "latency_ewma_s": round(self.latency, 3),
+            "error_rate": round(self.error_rate, 3),
+            "hedge_delay_s": round(self.hedge_delay(), 3),
+            "samples": len(self.samples),
+        }
+
+
+class LLMRouter:
+    def __init__(self, hedge: bool = LLM_HEDGE_ENABLED):
+        self.hedge = hedge
+        self.stats: Dict[str, ProviderStats] = {}
+
+    def _stats(self, provider: str) -> ProviderStats:
+        if provider not in self.stats:
+            self.stats[provider] = ProviderStats()
+        return self.stats[provider]
+
+    def rank(self, providers: List[str]) -> List[str]:
+        """Providers by score; ties keep the caller's order"""
+        return sorted(providers, key=lambda provider: self._stats(provider).score())
+
+    async def _timed(self, provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # A hedge loser says nothing about the provider
+            raise
+        except Exception:
+            self._stats(provider).record(time.perf_counter() - started, ok=False)
+            raise
+        self._stats(provider).record(time.perf_counter() - started, ok=True)
+        return result
+
+    async def run(self, calls: Dict[str, Callable[[], Awaitable[Any]]]) -> Tuple[str, Any]:
+        """Run calls (provider name -> coroutine factory) hedged; return (provider, result) of the first success.
+
+        A call should raise on an unusable answer, such as invalid JSON, so
+        that the next provider gets its turn.
+        """
+        order = self.rank(list(calls))
+        pending: Dict[asyncio.Task, str] = {}
+        errors: Dict[str, BaseException] = {}
+        next_index = 0
+        hedge_at: Optional[float] = None
+
+        def launch(reason: Optional[str] = None):
+            nonlocal next_index, hedge_at
+            provider = order[next_index]
+            next_index += 1
+            if reason:
+                LLM_HEDGED.labels(provider=provider, reason=reason).inc()
+                logger.info(f"🔀 Starting {provider} ({reason})")
+            pending[asyncio.create_task(self._timed(provider, calls[provider]))] = provider
+            hedge_at = time.monotonic() + self._stats(provider).hedge_delay()
+
+        try:
+            if order:
+                launch()
+            while pending:
+                can_hedge = self.hedge and next_index < len(order)
+                timeout = max(0.0, hedge_at - time.monotonic()) if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch("slow")
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is None:
+                        LLM_ROUTER_WINS.labels(provider=provider).inc()
+                        return provider, task.result()
+                    errors[provider] = task.exception()
+                    logger.warning(f"⚠️ {provider} failed: {task.exception()}")
+                if not pending and next_index < len(order):
+                    # No point falling back if the caller has already given up
+                    check_deadline()
+                    launch("failed")
+            raise AllProvidersFailed(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {provider: stats.snapshot() for provider, stats in self.stats.items()}
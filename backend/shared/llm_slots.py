@@ -0,0 +1,39 @@
+"""
+Per-process cap on concurrent LLM calls.
+
+LLM calls are awaited on the event loop, so nothing stops one process from
+starting hundreds of them at once. LLM_MAX_CONCURRENCY bounds that to stay
+within provider rate limits; callers beyond the cap wait for a slot, and the
+wait counts against the request's deadline.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from shared.deadline import with_deadline
+from shared.metrics import LLM_REQUESTS_IN_FLIGHT, LLM_REQUESTS_WAITING
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+
+_slots: Optional[asyncio.Semaphore] = None
+
+
+@asynccontextmanager
+async def llm_slot(timeout: float):
+    """Hold one LLM slot for the enclosed call, waiting at most timeout (or the deadline)"""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    LLM_REQUESTS_WAITING.inc()
+    try:
+        await with_deadline(_slots.acquire(), timeout)
+    finally:
+        LLM_REQUESTS_WAITING.dec()
+    LLM_REQUESTS_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        LLM_REQUESTS_IN_FLIGHT.dec()
+        _slots.release()
@@ -0,0 +1,322 @@
+"""
+Prometheus-style metrics shared by the gateway and every agent.
+
+A small self-contained implementation of counters, gauges and histograms that
+renders the Prometheus text exposition format, so services need no extra
+dependency. instrument_app() adds request latency and in-flight tracking to a
+FastAPI app and serves everything recorded in the process at GET /metrics.
+Metrics are per process; Prometheus adds the job/instance labels when scraping.
+Request and upstream series carry a service label naming the app that
+recorded them, since in-process gateway mode runs several apps in one process.
+"""
+
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Latency buckets in seconds, from fast cached reads up to long LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+        REGISTRY.register(self)
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        """The unlabelled child, for metrics declared without label names"""
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key, ("le", "+Inf"))
+        lines.append(f"{name}_bucket{labels} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {self.count}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        """Run collector before every scrape, to refresh gauges that mirror live state"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP server side
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, by route template and status",
+    ("service", "method", "route", "status"),
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("service",))
+
+# Database
+DB_POOL_ACQUIRE_DURATION = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+# LLM providers
+LLM_REQUEST_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Duration of LLM API calls",
+    ("provider", "model", "outcome"),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens consumed by LLM API calls", ("provider", "model", "kind"))
+LLM_REQUESTS_IN_FLIGHT = Gauge("llm_requests_in_flight", "LLM API calls currently running")
+LLM_REQUESTS_WAITING = Gauge("llm_requests_waiting", "LLM API calls waiting for a concurrency slot")
+
+# Gateway to agent calls
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds",
+    "Time until an agent answered a proxied request (response headers for streams)",
+    ("service", "agent", "status"),
+)
+
+
+def record_llm_call(provider: str, model: str, seconds: float, ok: bool,
+                    prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+    """Record the duration and token usage of one LLM API call"""
+    LLM_REQUEST_DURATION.labels(provider=provider, model=model, outcome="success" if ok else "error").observe(seconds)
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider=provider, model=model, kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider=provider, model=model, kind="completion").inc(completion_tokens)
+
+
+class LLMCall:
+    """Token usage of an LLM call, filled in by the caller inside track_llm_call()"""
+
+    def __init__(self):
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+
+    def set_usage(self, usage):
+        """Copy prompt/completion token counts from an OpenAI-style usage object"""
+        self.prompt_tokens = getattr(usage, "prompt_tokens", None)
+        self.completion_tokens = getattr(usage, "completion_tokens", None)
+
+    def set_gemini_usage(self, usage_metadata):
+        """Copy prompt/candidate token counts from a Gemini response's usage_metadata"""
+        self.prompt_tokens = getattr(usage_metadata, "prompt_token_count", None)
+        self.completion_tokens = getattr(usage_metadata, "candidates_token_count", None)
+
+
+@contextmanager
+def track_llm_call(provider: str, model: str):
+    """Time the enclosed LLM call and record it as a success unless it raises"""
+    call = LLMCall()
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield call
+        ok = True
+    finally:
+        record_llm_call(provider, model, time.perf_counter() - started, ok, call.prompt_tokens, call.completion_tokens)
+
+
+@asynccontextmanager
+async def timed_acquire(pool, timeout: Optional[float] = None):
+    """pool.acquire() that records how long the checkout waited"""
+    started = time.perf_counter()
+    async with pool.acquire(timeout=timeout) as connection:
+        DB_POOL_ACQUIRE_DURATION.observe(time.perf_counter() - started)
+        yield connection
+
+
+def route_template(scope) -> str:
+    """The path template of the route serving this request, to keep label cardinality bounded"""
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return route.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Record latency per route template and status, and the number of requests in flight"""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(service=self.service)
+
+        async def tracking_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_DURATION.labels(
+                service=self.service,
+                method=scope["method"],
+                route=route_template(scope),
+                status=str(status),
+            ).observe(time.perf_counter() - started)
+
+
+def instrument_app(app: FastAPI, service: str):
+    """Track request metrics for app, labelled with its service name, and serve them at GET /metrics"""
+    app.add_middleware(MetricsMiddleware, service=service)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
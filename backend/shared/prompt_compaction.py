@@ -0,0 +1,204 @@
+"""
+Compaction of resume text before it is pasted into LLM prompts.
+
+Text extracted from PDFs and DOCX files carries runs of whitespace, page
+numbers, and headers and footers repeated on every page, all of which cost
+prompt tokens (and so latency and money) without telling the model anything.
+compact_resume() normalizes whitespace, drops page artifacts and duplicate
+lines, splits the text into resume sections and, when it is still over
+PROMPT_TOKEN_BUDGET, trims the least useful sections first (references and
+hobbies go before education, which goes before experience and skills).
+Tokens before and after are logged and counted in prompt_tokens_total.
+
+Token counts are estimated at PROMPT_CHARS_PER_TOKEN characters per token,
+close enough for English text on the Llama and Gemini tokenizers to size a
+budget without loading either.
+"""
+
+import logging
+import math
+import os
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List
+
+from shared.metrics import Counter
+from shared.tracing import span
+
+logger = logging.getLogger(__name__)
+
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes")
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))  # resume tokens per prompt (0 = no limit)
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+# Shorter repeated lines (dates, job titles) are kept unless they repeat the header
+PROMPT_DEDUPE_MIN_CHARS = int(os.getenv("PROMPT_DEDUPE_MIN_CHARS", "20"))
+
+PROMPT_TOKENS = Counter(
+    "prompt_tokens_total",
+    "Estimated resume tokens before and after prompt compaction",
+    ("prompt", "stage"),
+)
+
+# Section name -> headings that open it. Lower priority numbers are kept longest.
+SECTIONS = {
+    "summary": ("summary", "professional summary", "profile", "about me", "objective", "career objective"),
+    "experience": ("experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "internships", "internship"),
+    "skills": ("skills", "technical skills", "core competencies", "key skills", "technologies", "tech stack"),
+    "education": ("education", "academic background", "qualifications", "academics"),
+    "projects": ("projects", "personal projects", "academic projects", "key projects"),
+    "certifications": ("certifications", "certificates", "licenses", "courses", "training"),
+    "achievements": ("achievements", "awards", "honors", "honours", "accomplishments"),
+    "publications": ("publications", "research", "papers"),
+    "volunteering": ("volunteering", "volunteer experience", "extracurricular activities", "activities", "leadership"),
+    "languages": ("languages",),
+    "interests": ("interests", "hobbies", "hobbies and interests"),
+    "references": ("references", "referees"),
+}
+SECTION_PRIORITY = {
+    "header": 0,  # name and contact details before the first heading
+    "experience": 1,
+    "skills": 1,
+    "summary": 2,
+    "education": 2,
+    "projects": 3,
+    "certifications": 4,
+    "achievements": 5,
+    "publications": 6,
+    "volunteering": 6,
+    "languages": 7,
+    "interests": 8,
+    "references": 9,
+}
+_HEADINGS = {heading: section for section, headings in SECTIONS.items() for heading in headings}
+
+_PAGE_ARTIFACT = re.compile(r"^(?:page\s*)?[-–—(\[]*\s*\d{1,3}\s*(?:(?:of|/)\s*\d{1,3})?\s*[-–—)\]]*$", re.IGNORECASE)
+_BULLET_ONLY = re.compile(r"^[\W_]*$")
+_HEADING_TRIM = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN) if text else 0
+
+
+def normalize_lines(text: str) -> List[str]:
+    """Whitespace-collapsed lines, without blank lines, page numbers and bullet-only lines"""
+    lines = []
+    for line in unicodedata.normalize("NFKC", text).splitlines():
+        line = " ".join(line.split())
+        if line and not _PAGE_ARTIFACT.match(line) and not _BULLET_ONLY.match(line):
+            lines.append(line)
+    return lines
+
+
+def dedupe_lines(lines: List[str]) -> List[str]:
+    """Lines in order without repeats (ignoring case) of long lines or of the header.
+
+    The header (name, contact details) before the first heading is what PDF
+    page headers repeat; a short line such as a date range may legitimately
+    appear under several jobs.
+    """
+    seen = set()
+    header = set()
+    in_header = True
+    kept = []
+    for line in lines:
+        key = line.casefold()
+        if in_header and section_of(line):
+            in_header = False
+        if key in seen and (len(line) >= PROMPT_DEDUPE_MIN_CHARS or key in header):
+            continue
+        seen.add(key)
+        if in_header:
+            header.add(key)
+        kept.append(line)
+    return kept
+
+
+def section_of(line: str) -> str:
+    """Name of the section this line opens, or "" when it is not a heading"""
+    if len(line) > 40:
+        return ""
+    return _HEADINGS.get(_HEADING_TRIM.sub("", line).casefold(), "")
+
+
+@dataclass
+class Section:
+    name: str
+    lines: List[str] = field(default_factory=list)
+
+
+def split_sections(lines: List[str]) -> List[Section]:
+    """Lines grouped under their headings; text before the first heading is the "header" section"""
+    sections = [Section("header")]
+    for line in lines:
+        name = section_of(line)
+        if name:
+            sections.append(Section(name))
+        sections[-1].lines.append(line)
+    return [section for section in sections if section.lines]
+
+
+def trim_to_budget(sections: List[Section], budget: int) -> List[str]:
+    """Drop lines from the end of the lowest-priority sections until the text fits the budget.
+
+    Returns the names of the sections that were cut.
+    """
+    excess = estimate_tokens("\n".join(line for section in sections for line in section.lines)) - budget
+    trimmed = []
+    # Lowest priority first; among equals, later sections go first
+    order = sorted(range(len(sections)), key=lambda index: (-SECTION_PRIORITY[sections[index].name], -index))
+    for index in order:
+        if excess <= 0:
+            break
+        section = sections[index]
+        trimmed.append(section.name)
+        while section.lines and excess > 0:
+            excess -= (len(section.lines.pop()) + 1) / PROMPT_CHARS_PER_TOKEN
+        if len(section.lines) == 1 and section_of(section.lines[0]):
+            # A heading with nothing left under it
+            section.lines.pop()
+    return trimmed
+
+
+@dataclass
+class Compaction:
+    text: str
+    original_tokens: int
+    tokens: int
+    trimmed_sections: List[str]
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+
+def compact_text(text: str, budget: int = PROMPT_TOKEN_BUDGET) -> Compaction:
+    """Compact resume text for a prompt, keeping it within budget tokens (0 = no limit)"""
+    sections = split_sections(dedupe_lines(normalize_lines(text)))
+    trimmed = trim_to_budget(sections, budget) if budget else []
+    compacted = "\n".join(line for section in sections for line in section.lines)
+    return Compaction(compacted, estimate_tokens(text), estimate_tokens(compacted), trimmed)
+
+
+def compact_resume(text: str, prompt: str, budget: int = PROMPT_TOKEN_BUDGET) -> str:
+    """Resume text to paste into the named prompt; reports the tokens saved"""
+    if not PROMPT_COMPACTION_ENABLED:
+        return text
+    with span("compact_prompt", {"prompt": prompt}) as compact_span:
+        result = compact_text(text, budget)
+        compact_span.set_attribute("tokens_saved", result.tokens_saved)
+    PROMPT_TOKENS.labels(prompt=prompt, stage="original").inc(result.original_tokens)
+    PROMPT_TOKENS.labels(prompt=prompt, stage="compacted").inc(result.tokens)
+    trimmed = f", trimmed {', '.join(result.trimmed_sections)}" if result.trimmed_sections else ""
+    logger.info(
+        f"✂️ Compacted resume for {prompt} prompt: ~{result.original_tokens} → ~{result.tokens} tokens "
+        f"({result.tokens_saved} saved{trimmed})"
+    )
+    return result.text
+
+
+def compact_whitespace(text: str) -> str:
+    """Text with blank lines dropped and whitespace runs collapsed, e.g. for a pasted job description"""
+    return "\n".join(" ".join(line.split()) for line in (text or "").splitlines() if line.strip())
@@ -0,0 +1,201 @@
+"""
+Resume prompts and response shaping shared by the resume analyzer and the profile service.
+
+Both services, and the analyzer's fused analyze-and-extract endpoint, build
+their LLM prompts from the JSON schemas here, so the profile extracted by
+either service has the same shape and a prompt change is made in one place.
+"""
+
+from typing import Any, Dict
+
+ANALYSIS_SYSTEM_PROMPT = "You are an expert resume analyzer. Always respond with valid JSON only."
+PROFILE_SYSTEM_PROMPT = "You are an expert at extracting structured data from resumes. Always return valid JSON only."
+COMBINED_SYSTEM_PROMPT = "You are an expert resume analyzer and data extractor. Always respond with valid JSON only."
+
+# "{job_role}" is filled in by analysis_schema()
+ANALYSIS_SCHEMA = """{
+            "overall_score": "Score out of 100",
+            "job_match_score": "How well resume matches the job role (0-100)",
+            "ats_score": "ATS compatibility score (0-100)",
+            "strengths": ["List of resume strengths relevant to the job"],
+            "weaknesses": ["Areas that need improvement"],
+            "skill_gaps": ["Missing skills for the job role"],
+            "recommendations": ["Specific recommendations to improve the resume"],
+            "keywords_found": ["Important keywords found in resume"],
+            "missing_keywords": ["Important keywords missing from resume"],
+            "sections_analysis": {
+                "summary": "Analysis of professional summary",
+                "experience": "Analysis of work experience",
+                "skills": "Analysis of skills section",
+                "education": "Analysis of education",
+                "overall_structure": "Analysis of resume structure and formatting"
+            },
+            "improvement_priority": ["Top 3 areas to focus on for improvement"],
+            "role_specific_advice": ["Advice specific to the {job_role} role"]
+        }"""
+
+PROFILE_SCHEMA = """{
+            "personal_info": {
+                "name": "Full name (only if clearly stated)",
+                "email": "Email address (only if found)",
+                "phone": "Phone number (only if found)",
+                "location": "Location/Address (only if found)",
+                "linkedin": "LinkedIn URL (only if found)",
+                "github": "GitHub URL (only if found)",
+                "portfolio": "Portfolio URL (only if found)"
+            },
+            "professional_summary": "Professional summary or objective (only if present)",
+            "skills": [
+                {
+                    "name": "Skill name",
+                    "level": "Beginner|Intermediate|Advanced|Expert",
+                    "category": "Technical|Soft|Language|Framework|Tool"
+                }
+            ],
+            "experience": [
+                {
+                    "company": "Company name",
+                    "position": "Job title",
+                    "location": "Work location",
+                    "startDate": "Start date (YYYY-MM format if possible)",
+                    "endDate": "End date (YYYY-MM format if possible)",
+                    "current": false,
+                    "description": "Job description and achievements",
+                    "technologies": ["List of technologies used"]
+                }
+            ],
+            "education": [
+                {
+                    "institution": "University/School name",
+                    "degree": "Degree name",
+                    "field": "Field of study",
+                    "startYear": "Start year",
+                    "endYear": "End year",
+                    "grade": "GPA or grade if mentioned",
+                    "description": "Additional details"
+                }
+            ],
+            "projects": [
+                {
+                    "title": "Project name",
+                    "description": "Project description",
+                    "technologies": ["Technologies used"],
+                    "startDate": "Start date if available",
+                    "endDate": "End date if available",
+                    "githubUrl": "GitHub URL if found",
+                    "liveUrl": "Live demo URL if found",
+                    "highlights": ["Key achievements or features"]
+                }
+            ],
+            "certifications": [
+                {
+                    "name": "Certification name",
+                    "issuer": "Issuing organization",
+                    "issueDate": "Issue date",
+                    "expiryDate": "Expiry date if applicable",
+                    "credentialId": "Credential ID if available",
+                    "credentialUrl": "Credential URL if available"
+                }
+            ]
+        }"""
+
+
+def analysis_schema(job_role: str) -> str:
+    return ANALYSIS_SCHEMA.replace("{job_role}", job_role)
+
+
+def analysis_prompt(resume_text: str, job_role: str, job_description: str = "") -> str:
+    """Prompt for the role-specific resume analysis"""
+    return f"""
+        Analyze this resume for the job role: {job_role}
+        
+        Job Description: {job_description}
+        
+        Resume Content:
+        {resume_text}
+        
+        Provide a comprehensive analysis in JSON format:
+        {analysis_schema(job_role)}
+        
+        Only return valid JSON, no additional text.
+        """
+
+
+def profile_prompt(resume_text: str) -> str:
+    """Prompt for structured profile extraction"""
+    return f"""
+        Extract structured profile information from this resume text. Be precise and only extract information that is clearly present.
+        
+        Resume Text:
+        {resume_text}
+        
+        Please provide a JSON response with the following structure:
+        {PROFILE_SCHEMA}
+        
+        Only return valid JSON, no additional text. If information is not found, use empty strings or empty arrays.
+        """
+
+
+def combined_prompt(resume_text: str, job_role: str, job_description: str = "") -> str:
+    """One prompt for both the profile extraction and the role analysis, sharing the resume text"""
+    return f"""
+        Read this resume once and do two things: extract the candidate's structured profile, and analyze the resume for the job role: {job_role}
+        Be precise and only extract profile information that is clearly present.
+        
+        Job Description: {job_description}
+        
+        Resume Content:
+        {resume_text}
+        
+        Provide a JSON response with exactly two keys, "profile" and "analysis":
+        {{
+        "profile": {PROFILE_SCHEMA},
+        "analysis": {analysis_schema(job_role)}
+        }}
+        
+        Only return valid JSON, no additional text. If profile information is not found, use empty strings or empty arrays.
+        """
+
+
+def format_profile(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape an extracted profile into the frontend's profile format"""
+    personal_info = extracted_data.get("personal_info", {})
+    return {
+        "personalInfo": {
+            "fullName": personal_info.get("name", ""),
+            "email": personal_info.get("email", ""),
+            "phone": personal_info.get("phone", ""),
+            "location": personal_info.get("location", ""),
+            "linkedin": personal_info.get("linkedin", ""),
+            "github": personal_info.get("github", ""),
+            "portfolio": personal_info.get("portfolio", ""),
+        },
+        "education": extracted_data.get("education", []),
+        "experience": extracted_data.get("experience", []),
+        "projects": extracted_data.get("projects", []),
+        "skills": extracted_data.get("skills", []),
+        "certifications": extracted_data.get("certifications", []),
+        "summary": extracted_data.get("professional_summary", "")
+    }
+
+
+def profile_confidence(formatted_data: Dict[str, Any]) -> float:
+    """Percentage of key profile fields and sections that were filled in"""
+    total_fields = 0
+    filled_fields = 0
+    
+    # Check personal info completeness
+    personal_info = formatted_data["personalInfo"]
+    for field in ["fullName", "email", "phone", "location"]:
+        total_fields += 1
+        if personal_info.get(field) and personal_info.get(field).strip():
+            filled_fields += 1
+    
+    # Check other sections
+    sections = ["skills", "experience", "education", "projects", "certifications"]
+    for section in sections:
+        total_fields += 1
+        if formatted_data.get(section) and len(formatted_data.get(section, [])) > 0:
+            filled_fields += 1
+    
+    return (filled_fields / total_fields) * 100 if total_fields > 0 else 0
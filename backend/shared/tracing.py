@@ -0,0 +1,222 @@
+"""
+Lightweight request tracing shared by the gateway and the agents.
+
+Each request gets a trace id, taken from the X-Trace-Id header when the caller
+sent one (the gateway always does) or generated otherwise, and every stage
+wrapped in span() becomes a timed span of that trace. Finished spans are
+written as JSON lines to stdout or a local file, selected with
+TRACE_EXPORTER=none|stdout|file, so a request's waterfall across services can
+be rebuilt offline by grouping on trace_id and following parent_id. Spans are
+queued and written by a background thread, so requests never wait on that I/O;
+the queue is flushed when the app shuts down.
+"""
+
+import atexit
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+TRACE_HEADER = "X-Trace-Id"
+PARENT_SPAN_HEADER = "X-Parent-Span-Id"
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# Finished spans waiting to be written; spans beyond this are dropped rather than block a request
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_service: ContextVar[str] = ContextVar("trace_service", default="unknown")
+
+
+def new_id(nbytes: int = 8) -> str:
+    return secrets.token_hex(nbytes)
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = new_id()
+        self.parent_id = parent_id
+        self.service = _service.get()
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.service,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    """Discards spans"""
+
+    def export(self, span: Span):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """Appends one JSON object per finished span to a stream.
+
+    export() only queues the span. A background thread serializes and writes
+    queued spans, flushing the stream whenever the queue runs dry.
+    """
+
+    def __init__(self, stream, max_queued: int = TRACE_QUEUE_SIZE):
+        self.stream = stream
+        self.queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queued)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._write_spans, name="trace-exporter", daemon=True)
+        self.thread.start()
+
+    def export(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_spans(self):
+        while True:
+            span = self.queue.get()
+            try:
+                if span is None:
+                    return
+                self.stream.write(json.dumps(span.to_dict(), default=str) + "\n")
+                if self.queue.empty():
+                    self.stream.flush()
+            except (OSError, ValueError):
+                pass  # a closed or broken stream must not stop the writer (or hang flush())
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued span has been written and flushed"""
+        if self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer thread"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+def create_exporter() -> SpanExporter:
+    """Build the exporter selected by TRACE_EXPORTER"""
+    if TRACE_EXPORTER == "stdout":
+        return JsonLinesExporter(sys.stdout)
+    if TRACE_EXPORTER == "file":
+        return JsonLinesExporter(open(TRACE_FILE, "a", encoding="utf-8"))
+    return SpanExporter()
+
+
+exporter = create_exporter()
+atexit.register(exporter.close)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, trace_id: Optional[str] = None, parent_id: Optional[str] = None):
+    """Time the enclosed block as a child of the current span, or as a new trace's root"""
+    parent = _current_span.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else new_id(16)
+        parent_id = parent.span_id if parent else None
+    current = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{e.__class__.__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        exporter.export(current)
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that make the next hop's spans children of the current span"""
+    current = _current_span.get()
+    if current is None:
+        return {}
+    return {TRACE_HEADER: current.trace_id, PARENT_SPAN_HEADER: current.span_id}
+
+
+class TracingMiddleware:
+    """Open a server span for every request and return its trace id in X-Trace-Id.
+
+    Queued spans are flushed before the app reports that it has shut down.
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+
+            async def flushing_send(message):
+                if message["type"] == "lifespan.shutdown.complete":
+                    exporter.flush()
+                await send(message)
+
+            await self.app(scope, receive, flushing_send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        trace_id = headers.get(TRACE_HEADER.lower()) or new_id(16)
+        parent_id = headers.get(PARENT_SPAN_HEADER.lower())
+        service_token = _service.set(self.service)
+
+        try:
+            with span(f"{scope['method']} {scope['path']}", trace_id=trace_id, parent_id=parent_id) as server_span:
+
+                async def traced_send(message):
+                    if message["type"] == "http.response.start":
+                        status = message["status"]
+                        server_span.set_attribute("http.status_code", status)
+                        if status >= 500:
+                            server_span.error = f"HTTP {status}"
+                        message["headers"] = list(message.get("headers", [])) + [(TRACE_HEADER.lower().encode(), trace_id.encode())]
+                    await send(message)
+
+                await self.app(scope, receive, traced_send)
+        finally:
+            _service.reset(service_token)
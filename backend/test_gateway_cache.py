@@ -0,0 +1,73 @@
+"""
+Tests for the API Gateway response cache.
+Runs the gateway's cached_get against a stubbed profile service, no live services needed:
+
+    python -m pytest test_gateway_cache.py
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "api-gateway"))
+
+import main as gateway  # noqa: E402
+from cache import InMemoryCache  # noqa: E402
+
+TEST_USER_ID = "test-user-12345"
+
+EMPTY_PROFILE = {"user_id": TEST_USER_ID, "full_name": "", "skills": []}
+REAL_PROFILE = {"user_id": TEST_USER_ID, "full_name": "Ada Lovelace", "skills": ["Python"]}
+
+
+class StubAgentClients:
+    """Answers agent GETs with queued bodies and counts the calls"""
+
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.calls = 0
+
+    async def request(self, agent_name, method, path, timeout=None, **kwargs):
+        self.calls += 1
+        return httpx.Response(200, json=self.bodies.pop(0))
+
+
+def get_profile_twice(monkeypatch, *bodies):
+    """Two cached profile reads; returns the stub and both responses"""
+    stub = StubAgentClients(*bodies)
+    monkeypatch.setattr(gateway, "agent_clients", stub)
+    monkeypatch.setattr(gateway, "response_cache", InMemoryCache())
+
+    async def read():
+        return await gateway.cached_get(TEST_USER_ID, f"/api/profile/{TEST_USER_ID}", "profile-service", f"/profile/{TEST_USER_ID}")
+
+    async def run():
+        return await read(), await read()
+
+    first, second = asyncio.run(run())
+    return stub, first, second
+
+
+def test_failing_profile_read_is_not_cached(monkeypatch):
+    """A 200 carrying _error (query failed or timed out) is served once, then refetched"""
+    stub, first, second = get_profile_twice(monkeypatch, {**EMPTY_PROFILE, "_error": "query timed out"}, REAL_PROFILE)
+    assert stub.calls == 2
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "MISS"
+    assert b"Ada Lovelace" in second.body
+
+
+def test_offline_profile_read_is_not_cached(monkeypatch):
+    """A 200 carrying _offline_mode (database not connected) is not cached either"""
+    stub, _, second = get_profile_twice(monkeypatch, {**EMPTY_PROFILE, "_offline_mode": True}, REAL_PROFILE)
+    assert stub.calls == 2
+    assert b"Ada Lovelace" in second.body
+
+
+def test_profile_read_is_cached(monkeypatch):
+    """A real profile is served from the cache on the next read"""
+    stub, _, second = get_profile_twice(monkeypatch, REAL_PROFILE)
+    assert stub.calls == 1
+    assert second.headers["X-Cache"] == "HIT"
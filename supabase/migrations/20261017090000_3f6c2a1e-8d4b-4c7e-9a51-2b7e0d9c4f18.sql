@@ -0,0 +1,19 @@
+-- Background resume analysis jobs (resume-analyzer job API)
+CREATE TABLE public.resume_analysis_jobs (
+    id UUID NOT NULL PRIMARY KEY,
+    user_id TEXT,
+    filename TEXT,
+    job_role TEXT,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'completed', 'failed')),
+    result JSONB,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX idx_resume_analysis_jobs_user_id ON public.resume_analysis_jobs(user_id, created_at DESC);
+CREATE INDEX idx_resume_analysis_jobs_status ON public.resume_analysis_jobs(status) WHERE status IN ('queued', 'processing');
+
+-- Only the backend (service role) reads and writes jobs
+ALTER TABLE public.resume_analysis_jobs ENABLE ROW LEVEL SECURITY;
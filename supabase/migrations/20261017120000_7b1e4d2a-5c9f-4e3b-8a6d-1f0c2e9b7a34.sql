@@ -0,0 +1,12 @@
+-- Content-addressed cache of resume analyses (resume-analyzer, ANALYSIS_CACHE_BACKEND=postgres)
+CREATE TABLE public.resume_analysis_cache (
+    cache_key TEXT NOT NULL PRIMARY KEY,
+    value JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX idx_resume_analysis_cache_expires_at ON public.resume_analysis_cache(expires_at);
+
+-- Only the backend (service role) reads and writes the cache
+ALTER TABLE public.resume_analysis_cache ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,8 @@
+-- Owner and heartbeat of background resume analysis jobs, so a starting
+-- process only fails jobs whose owning process has stopped renewing them
+ALTER TABLE public.resume_analysis_jobs
+    ADD COLUMN owner TEXT,
+    ADD COLUMN heartbeat_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now();
+
+DROP INDEX IF EXISTS idx_resume_analysis_jobs_status;
+CREATE INDEX idx_resume_analysis_jobs_active ON public.resume_analysis_jobs(owner, heartbeat_at) WHERE status IN ('queued', 'processing');